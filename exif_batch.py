@@ -0,0 +1,630 @@
+"""
+Traitement par lots : extraction des métadonnées et modifications groupées.
+"""
+import concurrent.futures
+import csv
+import glob
+import io
+import json
+import os
+import sys
+import time
+import zipfile
+from collections import deque
+
+import numpy as np
+
+from exif_io import (
+    format_gps_magnitudes, gps_coordinates, read_exif_data, to_float, update_exif_data,
+)
+from poi_maps import poi_index_for
+
+# Tags affichés dans le formulaire, qui forment aussi les colonnes de l'export
+FORM_TAGS = [
+    "DateTime", "Make", "Model", "ExposureTime", "FNumber", "ISOSpeedRatings",
+    "GPSLatitude", "GPSLongitude", "GPSLatitudeRef", "GPSLongitudeRef",
+]
+BATCH_COLUMNS = ["path"] + FORM_TAGS + ["NearestPOI", "NearestPOIDistanceKm", "error"]
+IMAGE_EXTENSIONS = (".jpg", ".jpeg")
+
+# Nombre de lignes regroupées par bloc dans un fichier Parquet
+PARQUET_BATCH_ROWS = 1024
+
+# Nombre d'images envoyées à la fois à un processus de travail
+BATCH_CHUNK_SIZE = 64
+BULK_CHUNK_SIZE = 8
+
+# Champs courants conservés par les enregistrements EXIF compacts : tag -> attribut
+EXIF_RECORD_TEXT_FIELDS = {"Make": "make", "Model": "model", "LensModel": "lens_model"}
+EXIF_RECORD_NUMBER_FIELDS = {
+    "ExposureTime": "exposure_time", "FNumber": "f_number",
+    "ISOSpeedRatings": "iso", "FocalLength": "focal_length",
+}
+EXIF_RECORD_TAGS = list(EXIF_RECORD_TEXT_FIELDS) + list(EXIF_RECORD_NUMBER_FIELDS) + [
+    "DateTime", "GPSLatitude", "GPSLatitudeRef", "GPSLongitude", "GPSLongitudeRef",
+]
+
+def _is_image_name(name):
+    return name.lower().endswith(IMAGE_EXTENSIONS)
+
+def iter_image_refs(source):
+    """
+    Énumère les images JPEG d'un dossier, d'un motif glob ou d'une archive ZIP.
+
+    Les images sont produites une par une : ni la liste des fichiers ni leur
+    contenu ne sont chargés en mémoire d'un coup. Les références produites
+    peuvent être transmises à un autre processus.
+
+    Args:
+        source (str): Un dossier (parcouru récursivement), un motif glob
+                      ou le chemin d'une archive ZIP.
+
+    Yields:
+        tuple: (nom de l'image, chemin ou couple (archive ZIP, membre)).
+    """
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if _is_image_name(name):
+                    path = os.path.join(root, name)
+                    yield path, path
+    elif zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and _is_image_name(info.filename):
+                    yield f"{source}:{info.filename}", (source, info.filename)
+    else:
+        for path in glob.iglob(source, recursive=True):
+            if os.path.isfile(path) and _is_image_name(path):
+                yield path, path
+
+def _read_form_row(name, image, archives=None):
+    """
+    Lit les métadonnées d'une image et prépare sa ligne d'export brute.
+
+    Args:
+        name (str): Le nom de l'image.
+        image: L'image (chemin, fichier binaire ou couple (archive ZIP, membre)).
+        archives (dict): Les archives ZIP déjà ouvertes, réutilisées d'une image à l'autre.
+
+    Returns:
+        tuple: (ligne d'export, dictionnaire EXIF, vide en cas d'échec).
+    """
+    row = dict.fromkeys(BATCH_COLUMNS, "")
+    row["path"] = name
+    try:
+        exif_data = read_exif_ref(image, archives, FORM_TAGS)
+    except Exception as e:
+        row["error"] = f"{type(e).__name__}: {e}"
+        exif_data = {}
+    for tag in FORM_TAGS:
+        if tag in exif_data:
+            row[tag] = str(exif_data[tag])
+    return row, exif_data
+
+def _fill_gps_columns(rows, exif_records, poi_catalog=None):
+    """
+    Remplace les coordonnées GPS brutes des lignes par leur valeur décimale
+    et indique le POI le plus proche de chaque image.
+
+    La conversion et la recherche sont faites pour tout le lot en une fois.
+    """
+    lat, lon = gps_coordinates(exif_records)
+    for column, values in (("GPSLatitude", lat), ("GPSLongitude", lon)):
+        for row, text in zip(rows, format_gps_magnitudes(values)):
+            row[column] = text
+    if not np.isnan(lat).all():
+        index = poi_index_for(poi_catalog)
+        positions, distances = index.nearest(lat, lon)
+        for row, position, distance in zip(rows, positions[:, 0], distances[:, 0]):
+            if position >= 0:
+                row["NearestPOI"] = index.pois[position]['name']
+                row["NearestPOIDistanceKm"] = f"{distance:.3f}"
+    return rows
+
+def extract_rows_chunk(chunk, poi_catalog=None):
+    """
+    Extrait les lignes d'export d'un lot d'images.
+
+    Cette fonction est exécutée par les processus de travail : chaque archive
+    ZIP n'y est ouverte qu'une fois par lot.
+
+    Args:
+        chunk (list): Une liste de couples (nom de l'image, référence).
+        poi_catalog (str): Le catalogue CSV des POI ; les POI de l'application si absent.
+
+    Returns:
+        list: Les lignes d'export, dans l'ordre du lot.
+    """
+    rows = []
+    exif_records = []
+    archives = {}
+    try:
+        for name, ref in chunk:
+            row, exif_data = _read_form_row(name, ref, archives)
+            rows.append(row)
+            exif_records.append(exif_data)
+    finally:
+        for archive in archives.values():
+            archive.close()
+    return _fill_gps_columns(rows, exif_records, poi_catalog)
+
+def chunked(items, size):
+    """
+    Regroupe les éléments d'un itérable en listes de size éléments au plus.
+    """
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def map_chunks(func, chunks, *args, workers=1, ordered=True, threads=False):
+    """
+    Applique une fonction à des lots, éventuellement dans un pool de processus.
+
+    Le nombre de lots en attente est borné à deux par processus, pour que la
+    mémoire utilisée ne dépende pas du nombre de lots.
+
+    Args:
+        func: La fonction appelée avec (lot, *args) ; elle doit être définie
+              au niveau du module pour être transmise aux processus.
+        chunks: Un itérable de lots.
+        workers (int): Le nombre de processus ; 1 pour tout traiter ici.
+        ordered (bool): Conserver l'ordre des lots (sinon, les résultats sont
+                        produits dès qu'un lot est terminé).
+        threads (bool): Utiliser des threads plutôt que des processus, quand le
+                        coût de transfert des lots dépasse celui du calcul.
+
+    Yields:
+        Le résultat de func pour chaque lot.
+    """
+    if workers <= 1:
+        for chunk in chunks:
+            yield func(chunk, *args)
+        return
+    pool = concurrent.futures.ThreadPoolExecutor if threads else concurrent.futures.ProcessPoolExecutor
+    with pool(max_workers=workers) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(func, chunk, *args))
+            while len(pending) >= 2 * workers:
+                yield _next_result(pending, ordered)
+        while pending:
+            yield _next_result(pending, ordered)
+
+def _next_result(pending, ordered):
+    """
+    Attend un lot terminé et renvoie son résultat.
+
+    Args:
+        pending (deque): Les lots soumis, dans l'ordre de soumission.
+        ordered (bool): Attendre le plus ancien lot plutôt que le premier terminé.
+    """
+    if ordered:
+        return pending.popleft().result()
+    done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+    future = next(iter(done))
+    pending.remove(future)
+    return future.result()
+
+def extract_rows(source, workers=1, chunk_size=BATCH_CHUNK_SIZE, ordered=True, poi_catalog=None):
+    """
+    Extrait les lignes d'export d'un lot d'images, éventuellement en parallèle.
+
+    Args:
+        source (str): Un dossier, un motif glob ou une archive ZIP.
+        workers (int): Le nombre de processus ; 1 pour tout traiter ici.
+        chunk_size (int): Le nombre d'images par lot envoyé à un processus.
+        ordered (bool): Conserver l'ordre des images.
+        poi_catalog (str): Le catalogue CSV des POI ; les POI de l'application si absent.
+
+    Yields:
+        dict: Une ligne d'export par image.
+    """
+    chunks = chunked(iter_image_refs(source), chunk_size)
+    for rows in map_chunks(extract_rows_chunk, chunks, poi_catalog, workers=workers, ordered=ordered):
+        yield from rows
+
+class CsvRowWriter:
+    """
+    Écrit les lignes d'export au format CSV, au fil de l'eau.
+    """
+
+    def __init__(self, path):
+        self._file = open(path, "w", newline="", encoding="utf-8")
+        self._writer = csv.DictWriter(self._file, fieldnames=BATCH_COLUMNS)
+        self._writer.writeheader()
+
+    def write(self, row):
+        self._writer.writerow(row)
+
+    def close(self):
+        self._file.close()
+
+class JsonLinesRowWriter:
+    """
+    Écrit les lignes d'export au format JSON Lines, au fil de l'eau.
+    """
+
+    def __init__(self, path):
+        self._file = open(path, "w", encoding="utf-8")
+
+    def write(self, row):
+        self._file.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+    def close(self):
+        self._file.close()
+
+class ParquetRowWriter:
+    """
+    Écrit les lignes d'export au format Parquet, par blocs de taille fixe.
+    """
+
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise RuntimeError("Parquet output requires pyarrow") from e
+        self._pa = pa
+        self._schema = pa.schema([(column, pa.string()) for column in BATCH_COLUMNS])
+        self._writer = pq.ParquetWriter(path, self._schema)
+        self._rows = []
+
+    def write(self, row):
+        self._rows.append(row)
+        if len(self._rows) >= PARQUET_BATCH_ROWS:
+            self._flush()
+
+    def _flush(self):
+        if self._rows:
+            table = self._pa.Table.from_pylist(self._rows, schema=self._schema)
+            self._writer.write_table(table)
+            self._rows = []
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+BATCH_WRITERS = {
+    "csv": CsvRowWriter,
+    "jsonl": JsonLinesRowWriter,
+    "parquet": ParquetRowWriter,
+}
+
+def open_batch_writer(output, fmt=None):
+    """
+    Ouvre l'écrivain d'export correspondant au format demandé.
+
+    Args:
+        output (str): Le fichier de sortie.
+        fmt (str): 'csv', 'jsonl' ou 'parquet' ; déduit de l'extension si absent.
+
+    Returns:
+        L'écrivain, avec ses méthodes write(row) et close().
+    """
+    if fmt is None:
+        extension = os.path.splitext(output)[1].lower().lstrip(".")
+        fmt = {"ndjson": "jsonl", "pq": "parquet"}.get(extension, extension)
+    if fmt not in BATCH_WRITERS:
+        raise ValueError(f"Unsupported output format: {fmt!r}")
+    return BATCH_WRITERS[fmt](output)
+
+def run_batch(source, output, fmt=None, progress=None, workers=1,
+              chunk_size=BATCH_CHUNK_SIZE, ordered=True, poi_catalog=None):
+    """
+    Extrait les métadonnées EXIF d'un lot d'images vers un fichier d'export.
+
+    Chaque image donne une ligne, écrite dès qu'elle est extraite : la
+    mémoire utilisée ne dépend pas du nombre d'images.
+
+    Args:
+        source (str): Un dossier, un motif glob ou une archive ZIP.
+        output (str): Le fichier de sortie (CSV, JSON Lines ou Parquet).
+        fmt (str): Le format de sortie ; déduit de l'extension si absent.
+        progress: Une fonction appelée après chaque image avec
+                  (nombre d'images traitées, nom de l'image).
+        workers (int): Le nombre de processus d'extraction.
+        chunk_size (int): Le nombre d'images par lot envoyé à un processus.
+        ordered (bool): Écrire les lignes dans l'ordre des images.
+        poi_catalog (str): Le catalogue CSV des POI (name, lat, lon) utilisé
+                           pour la colonne NearestPOI.
+
+    Returns:
+        int: Le nombre d'images traitées.
+    """
+    writer = open_batch_writer(output, fmt)
+    count = 0
+    try:
+        for row in extract_rows(source, workers, chunk_size, ordered, poi_catalog):
+            writer.write(row)
+            count += 1
+            if progress is not None:
+                progress(count, row["path"])
+    finally:
+        writer.close()
+    return count
+
+def make_progress_printer(every=100):
+    """
+    Crée une fonction de progression qui affiche le débit sur la sortie d'erreur.
+
+    Args:
+        every (int): Le nombre d'images entre deux affichages.
+    """
+    started = time.monotonic()
+
+    def progress(count, name):
+        if count % every == 0:
+            elapsed = max(time.monotonic() - started, 1e-9)
+            print(f"\r{count} images ({count / elapsed:.0f}/s)", end="", file=sys.stderr, flush=True)
+
+    return progress
+
+def update_exif_chunk(chunk, updated_exif):
+    """
+    Applique les mêmes modifications EXIF à un lot d'images.
+
+    Args:
+        chunk (list): Une liste de couples (nom de l'image, chemin ou contenu en bytes).
+        updated_exif: Un dictionnaire avec les nouvelles valeurs EXIF.
+
+    Returns:
+        list: Des triplets (nom, JPEG mis à jour ou None, message d'erreur).
+    """
+    results = []
+    for name, image in chunk:
+        try:
+            results.append((name, update_exif_data(image, updated_exif), ""))
+        except Exception as e:
+            results.append((name, None, f"{type(e).__name__}: {e}"))
+    return results
+
+def _unique_name(name, used):
+    """
+    Renvoie un nom de fichier absent de used, en ajoutant un suffixe si besoin.
+    """
+    base, extension = os.path.splitext(os.path.basename(name) or "image.jpg")
+    candidate, index = base + extension, 1
+    while candidate in used:
+        candidate = f"{base}_{index}{extension}"
+        index += 1
+    used.add(candidate)
+    return candidate
+
+def bulk_update_exif(images, updated_exif, output=None, workers=1, chunk_size=BULK_CHUNK_SIZE):
+    """
+    Applique une même modification EXIF à plusieurs images et les regroupe dans un ZIP.
+
+    Chaque image est modifiée sans ré-encodage (voir update_exif_data). Une
+    image en échec n'interrompt pas le traitement : elle est absente du ZIP
+    et son erreur figure dans le rapport, écrit aussi dans report.csv.
+
+    Remplacer le segment EXIF ne prend que quelques millisecondes : envoyer
+    les images à des processus coûterait plus cher que le calcul. Les lots
+    sont donc traités ici, ou par des threads qui recouvrent la lecture des
+    fichiers sur disque.
+
+    Args:
+        images: Un itérable de couples (nom de l'image, chemin ou contenu en bytes).
+        updated_exif: Un dictionnaire avec les nouvelles valeurs EXIF.
+        output: Le fichier ZIP de sortie (chemin ou fichier binaire) ;
+                le ZIP est renvoyé en bytes si absent.
+        workers (int): Le nombre de threads.
+        chunk_size (int): Le nombre d'images par lot envoyé à un thread.
+
+    Returns:
+        tuple: (contenu du ZIP en bytes, ou None si output est fourni,
+                liste de dictionnaires {'file', 'status', 'error'}).
+    """
+    target = io.BytesIO() if output is None else output
+    report = []
+    used = set()
+    chunks = chunked(images, chunk_size)
+    # Les JPEG ne se compressent pas : ils sont stockés tels quels dans le ZIP
+    with zipfile.ZipFile(target, "w", zipfile.ZIP_STORED) as archive:
+        for results in map_chunks(update_exif_chunk, chunks, updated_exif, workers=workers,
+                                  threads=True):
+            for name, data, error in results:
+                if data is not None:
+                    archive.writestr(_unique_name(name, used), data)
+                report.append({"file": name, "status": "error" if error else "ok", "error": error})
+        lines = io.StringIO()
+        writer = csv.DictWriter(lines, fieldnames=["file", "status", "error"])
+        writer.writeheader()
+        writer.writerows(report)
+        archive.writestr("report.csv", lines.getvalue())
+    return (target.getvalue() if output is None else None), report
+
+def ref_name(ref):
+    """
+    Le nom d'une référence de lot, tel que le produit iter_image_refs.
+    """
+    if isinstance(ref, tuple):
+        return f"{ref[0]}:{ref[1]}"
+    return "" if ref is None else ref
+
+def read_exif_ref(ref, archives=None, tags=None):
+    """
+    Lit les métadonnées EXIF d'une image désignée par une référence de lot.
+
+    Args:
+        ref: Un chemin, ou un couple (archive ZIP, membre) comme ceux de iter_image_refs.
+        archives (dict): Les archives déjà ouvertes, réutilisées d'un appel à l'autre.
+        tags: Les noms des tags à extraire ; tous si absent.
+
+    Returns:
+        LazyExif: Une vue {nom du tag: valeur} des métadonnées EXIF de l'image.
+    """
+    if not isinstance(ref, tuple):
+        return read_exif_data(ref, tags)
+    archive_path, member = ref
+    if archives is None:
+        with zipfile.ZipFile(archive_path) as archive, archive.open(member) as fp:
+            return read_exif_data(fp, tags)
+    if archive_path not in archives:
+        archives[archive_path] = zipfile.ZipFile(archive_path)
+    with archives[archive_path].open(member) as fp:
+        return read_exif_data(fp, tags)
+
+class ExifRecord:
+    """
+    Enregistrement compact des métadonnées EXIF courantes d'une photo.
+
+    Seuls les champs courants sont conservés, dans des attributs typés
+    (__slots__) : textes partagés entre enregistrements, nombres flottants et
+    position GPS décimale. Les autres tags (MakerNote, miniature...) ne sont
+    pas gardés en mémoire ; ils sont relus à la demande depuis l'image.
+    Une image illisible donne un enregistrement vide dont l'attribut error
+    décrit l'échec.
+    """
+
+    __slots__ = ("source",) + tuple(EXIF_RECORD_TEXT_FIELDS.values()) \
+        + tuple(EXIF_RECORD_NUMBER_FIELDS.values()) + ("datetime", "lat", "lon", "error")
+
+    def __init__(self, source=None, datetime="", lat=np.nan, lon=np.nan, error="", **fields):
+        self.source = source
+        self.datetime = datetime
+        self.lat = lat
+        self.lon = lon
+        self.error = error
+        for attr in EXIF_RECORD_TEXT_FIELDS.values():
+            setattr(self, attr, fields.pop(attr, ""))
+        for attr in EXIF_RECORD_NUMBER_FIELDS.values():
+            setattr(self, attr, fields.pop(attr, np.nan))
+        if fields:
+            raise TypeError(f"Unknown EXIF record fields: {', '.join(fields)}")
+
+    @classmethod
+    def from_exif(cls, exif_data, source=None):
+        """
+        Construit l'enregistrement à partir d'un dictionnaire renvoyé par get_exif_data.
+
+        Args:
+            exif_data (dict): Les métadonnées EXIF de la photo.
+            source: Le chemin ou la référence (archive ZIP, membre) de la
+                    photo, pour relire les tags non conservés.
+
+        Returns:
+            ExifRecord: L'enregistrement compact.
+        """
+        lat, lon = gps_coordinates([exif_data])
+        fields = {attr: sys.intern(str(exif_data.get(tag, "")).strip("\x00 "))
+                  for tag, attr in EXIF_RECORD_TEXT_FIELDS.items()}
+        fields.update({attr: to_float(exif_data.get(tag))
+                       for tag, attr in EXIF_RECORD_NUMBER_FIELDS.items()})
+        return cls(source, str(exif_data.get("DateTime", "")).strip("\x00 "),
+                   float(lat[0]), float(lon[0]), **fields)
+
+    def __repr__(self):
+        return f"ExifRecord({self.source!r}, {self.make!r}, {self.model!r}, {self.datetime!r})"
+
+    def __getstate__(self):
+        return tuple(getattr(self, attr) for attr in self.__slots__)
+
+    def __setstate__(self, state):
+        for attr, value in zip(self.__slots__, state):
+            setattr(self, attr, value)
+
+    def get(self, tag_name, default=None):
+        """
+        Renvoie la valeur d'un tag, comme le ferait le dictionnaire de get_exif_data.
+
+        Les champs courants sont lus dans l'enregistrement ; les coordonnées
+        GPS sont renvoyées en degrés décimaux avec leur référence. Un autre
+        tag entraîne une nouvelle lecture des métadonnées de l'image.
+        """
+        if tag_name in EXIF_RECORD_TEXT_FIELDS:
+            return getattr(self, EXIF_RECORD_TEXT_FIELDS[tag_name]) or default
+        if tag_name in EXIF_RECORD_NUMBER_FIELDS:
+            value = getattr(self, EXIF_RECORD_NUMBER_FIELDS[tag_name])
+            return default if np.isnan(value) else value
+        if tag_name == "DateTime":
+            return self.datetime or default
+        if tag_name in ("GPSLatitude", "GPSLatitudeRef", "GPSLongitude", "GPSLongitudeRef"):
+            value = self.lat if tag_name.startswith("GPSLatitude") else self.lon
+            if np.isnan(value):
+                return default
+            if tag_name.endswith("Ref"):
+                positive, negative = ("N", "S") if tag_name.startswith("GPSLatitude") else ("E", "W")
+                return negative if value < 0 else positive
+            return abs(value)
+        return self.load().get(tag_name, default)
+
+    def __getitem__(self, tag_name):
+        value = self.get(tag_name)
+        if value is None:
+            raise KeyError(tag_name)
+        return value
+
+    def load(self):
+        """
+        Relit toutes les métadonnées EXIF de la photo (tags rares ou volumineux compris).
+
+        Le résultat n'est pas conservé dans l'enregistrement.
+
+        Returns:
+            dict: Un dictionnaire contenant les métadonnées EXIF de l'image,
+                  vide si la photo n'a pas de source ou n'a pas pu être lue.
+        """
+        if self.source is None or self.error:
+            return {}
+        return read_exif_ref(self.source)
+
+    def to_dict(self):
+        """
+        Renvoie les champs courants sous forme de dictionnaire {nom du tag: valeur}.
+        """
+        exif_data = {}
+        for tag_name in EXIF_RECORD_TAGS:
+            value = self.get(tag_name)
+            if value is not None:
+                exif_data[tag_name] = value
+        return exif_data
+
+def extract_records_chunk(chunk):
+    """
+    Lit les enregistrements EXIF compacts d'un lot d'images.
+
+    Args:
+        chunk (list): Une liste de couples (nom de l'image, référence).
+
+    Returns:
+        list: Les enregistrements, dans l'ordre du lot ; ceux des images
+              illisibles sont vides et décrivent l'erreur (attribut error).
+    """
+    records = []
+    archives = {}
+    try:
+        for name, ref in chunk:
+            try:
+                exif_data = read_exif_ref(ref, archives, EXIF_RECORD_TAGS)
+            except Exception as e:
+                records.append(ExifRecord(source=ref, error=f"{type(e).__name__}: {e}"))
+            else:
+                records.append(ExifRecord.from_exif(exif_data, source=ref))
+    finally:
+        for archive in archives.values():
+            archive.close()
+    return records
+
+def extract_records(source, workers=1, chunk_size=BATCH_CHUNK_SIZE):
+    """
+    Extrait les enregistrements EXIF compacts d'un lot d'images.
+
+    Args:
+        source (str): Un dossier, un motif glob ou une archive ZIP.
+        workers (int): Le nombre de processus d'extraction.
+        chunk_size (int): Le nombre d'images par lot envoyé à un processus.
+
+    Yields:
+        ExifRecord: Un enregistrement par image, dans l'ordre des images.
+    """
+    chunks = chunked(iter_image_refs(source), chunk_size)
+    for records in map_chunks(extract_records_chunk, chunks, workers=workers):
+        yield from records
@@ -0,0 +1,310 @@
+"""
+Mesures de performance du pipeline EXIF et cartes sur des corpus synthétiques.
+"""
+import io
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+from exif_io import get_exif_data, make_preview, update_exif_data
+from poi_maps import NEAREST_POI_COUNT, POI_MARKER_LIMIT, add_pois, display_map, map_html
+from exif_batch import FORM_TAGS
+
+# Mesures de performance : corpus synthétiques (taille des images, densité
+# des métadonnées) et nombres de POI des cartes
+BENCH_IMAGE_SIZES = {"small": (640, 480), "medium": (2000, 1500), "large": (4000, 3000)}
+BENCH_TAG_DENSITIES = {
+    "minimal": {"Make": "Synthetic", "Model": "Bench", "DateTime": "2023:06:01 12:00:00"},
+    "camera": {
+        "Make": "Synthetic", "Model": "Bench", "DateTime": "2023:06:01 12:00:00",
+        "ExposureTime": "1/250", "FNumber": 2.8, "ISOSpeedRatings": 400, "FocalLength": 35,
+        "LensModel": "Bench 35mm", "GPSLatitude": 0.0, "GPSLatitudeRef": "N",
+        "GPSLongitude": 0.0, "GPSLongitudeRef": "E",
+    },
+    "makernote": {
+        "Make": "Synthetic", "Model": "Bench", "DateTime": "2023:06:01 12:00:00",
+        "ExposureTime": "1/250", "FNumber": 2.8, "ISOSpeedRatings": 400, "FocalLength": 35,
+        "LensModel": "Bench 35mm", "GPSLatitude": 0.0, "GPSLatitudeRef": "N",
+        "GPSLongitude": 0.0, "GPSLongitudeRef": "E",
+        "MakerNote": bytes(range(256)) * 160, "UserComment": b"ASCII\x00\x00\x00" + b"x" * 4000,
+    },
+}
+BENCH_POI_COUNTS = (100, 10000)
+
+def make_synthetic_jpeg(width, height, density="camera", seed=0):
+    """
+    Génère une photo JPEG synthétique et reproductible pour les mesures de performance.
+
+    Args:
+        width (int): La largeur de l'image en pixels.
+        height (int): La hauteur de l'image en pixels.
+        density (str): La densité des métadonnées, une clé de BENCH_TAG_DENSITIES.
+        seed (int): La graine du générateur aléatoire.
+
+    Returns:
+        bytes: Le fichier JPEG, avec ses métadonnées EXIF.
+    """
+    rng = np.random.default_rng(seed)
+    # Un bruit basse résolution agrandi se compresse comme une photo, sans
+    # allouer de gros tableaux intermédiaires qui fausseraient le pic mémoire
+    small = rng.integers(0, 256, size=(max(height // 16, 1), max(width // 16, 1), 3), dtype=np.uint8)
+    img = Image.fromarray(small).resize((width, height), Image.BILINEAR)
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=90)
+    tags = dict(BENCH_TAG_DENSITIES[density])
+    if "GPSLatitude" in tags:
+        tags["GPSLatitude"] = round(float(rng.uniform(0, 80)), 6)
+        tags["GPSLongitude"] = round(float(rng.uniform(0, 170)), 6)
+    return update_exif_data(buf.getvalue(), tags)
+
+def synthetic_pois(count, seed=0):
+    """
+    Génère des POI répartis au hasard sur le globe.
+    """
+    rng = np.random.default_rng(seed)
+    lats = np.degrees(np.arcsin(rng.uniform(-1, 1, count)))
+    lons = rng.uniform(-180, 180, count)
+    return [{'name': f"POI {i}", 'lat': float(lat), 'lon': float(lon)}
+            for i, (lat, lon) in enumerate(zip(lats, lons))]
+
+def reset_peak_rss():
+    """
+    Remet à zéro le pic de mémoire résidente du processus, si le système le permet.
+
+    Seul Linux le permet (écriture de 5 dans /proc/self/clear_refs) ; ailleurs,
+    le pic reste celui de toute la vie du processus.
+
+    Returns:
+        bool: True si le pic a été remis à zéro.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as fp:
+            fp.write("5")
+    except OSError:
+        return False
+    return True
+
+def _proc_status_mb(field):
+    """
+    Lit une taille (VmRSS, VmHWM...) dans /proc/self/status, en Mio, ou None.
+    """
+    try:
+        with open("/proc/self/status") as fp:
+            for line in fp:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+def peak_rss_mb():
+    """
+    Renvoie le pic de mémoire résidente du processus en Mio, ou None si inconnu.
+
+    Sous Linux, le pic est lu dans /proc/self/status (VmHWM), qui suit les
+    remises à zéro de reset_peak_rss.
+    """
+    peak = _proc_status_mb("VmHWM")
+    if peak is not None:
+        return peak
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux compte en Kio, macOS en octets
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def measure(stage, func, items, item_bytes=None, **labels):
+    """
+    Mesure une étape du pipeline sur une série d'éléments.
+
+    Les mesures de mémoire sont propres à l'étape : le pic de mémoire
+    résidente et sa hausse par rapport au début de l'étape (pic remis à zéro
+    avant l'étape, sous Linux seulement ; None ailleurs), et le pic des
+    allocations Python et NumPy suivies par tracemalloc pendant un appel
+    supplémentaire, non chronométré, sur le premier élément.
+
+    Args:
+        stage (str): Le nom de l'étape.
+        func: La fonction mesurée, appelée avec chaque élément.
+        items (list): Les éléments traités, un appel chacun.
+        item_bytes (list): La taille en octets de chaque élément, pour le débit en Mo/s.
+        labels: Des informations reportées telles quelles dans le résultat.
+
+    Returns:
+        dict: Le nombre d'appels, le débit (fichiers/s, Mo/s), les latences
+              p50 et p99 (ms) et les pics de mémoire de l'étape (Mio).
+    """
+    import tracemalloc
+    resettable = reset_peak_rss()
+    rss_before = _proc_status_mb("VmRSS") if resettable else None
+    latencies = []
+    for item in items:
+        start = time.perf_counter()
+        func(item)
+        latencies.append(time.perf_counter() - start)
+    peak_rss = peak_rss_mb() if resettable else None
+    # tracemalloc ralentit les appels : il n'est actif qu'en dehors du chronométrage
+    tracemalloc.start()
+    try:
+        func(next(iter(items)))
+        peak_traced = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    latencies = np.array(latencies)
+    total = float(latencies.sum())
+    result = {"stage": stage, **labels, "count": len(latencies), "seconds": round(total, 6),
+              "files_per_s": round(len(latencies) / total, 2) if total else None,
+              "mb_per_s": None,
+              "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 4),
+              "p99_ms": round(float(np.percentile(latencies, 99)) * 1000, 4),
+              "peak_rss_mb": None if peak_rss is None else round(peak_rss, 1),
+              "rss_growth_mb": None if rss_before is None else round(peak_rss - rss_before, 1),
+              "peak_traced_mb": round(peak_traced / (1024 * 1024), 3)}
+    if item_bytes is not None and total:
+        result["mb_per_s"] = round(sum(item_bytes) / total / 1e6, 2)
+    return result
+
+def _git_commit():
+    """
+    Renvoie le commit courant du dépôt, pour comparer les résultats entre commits.
+    """
+    import subprocess
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmarks(sizes=BENCH_IMAGE_SIZES, densities=tuple(BENCH_TAG_DENSITIES), files=20,
+                   poi_counts=BENCH_POI_COUNTS, seed=0, progress=None):
+    """
+    Mesure la lecture EXIF, la réécriture, l'aperçu et le rendu des cartes.
+
+    Les corpus sont générés dans un dossier temporaire, une fois par taille
+    d'image et densité de métadonnées ; la lecture passe donc par les fichiers
+    sur disque, comme le traitement par lot.
+
+    Args:
+        sizes (dict): {nom: (largeur, hauteur)} des corpus d'images.
+        densities: Les densités de métadonnées (clés de BENCH_TAG_DENSITIES).
+        files (int): Le nombre de fichiers par corpus.
+        poi_counts: Les nombres de POI des cartes mesurées.
+        seed (int): La graine des données synthétiques.
+        progress: Une fonction appelée avec chaque résultat dès qu'il est mesuré.
+
+    Returns:
+        dict: Le contexte (commit, versions, paramètres) et la liste des résultats.
+    """
+    import folium
+    results = []
+
+    def record(result):
+        results.append(result)
+        if progress is not None:
+            progress(result)
+
+    update = {"Make": "Bench", "Model": "Edited", "DateTime": "2024:01:01 12:00:00",
+              "GPSLatitude": 48.8584, "GPSLatitudeRef": "N",
+              "GPSLongitude": 2.2945, "GPSLongitudeRef": "E"}
+    with tempfile.TemporaryDirectory(prefix="exif-bench-") as tmp:
+        for size_name, (width, height) in sizes.items():
+            for density in densities:
+                paths = []
+                for i in range(files):
+                    path = os.path.join(tmp, f"{size_name}-{density}-{i}.jpg")
+                    with open(path, "wb") as fp:
+                        fp.write(make_synthetic_jpeg(width, height, density, seed + i))
+                    paths.append(path)
+                sizes_bytes = [os.path.getsize(path) for path in paths]
+                labels = {"corpus": size_name, "density": density}
+                record(measure("read", lambda p: dict(get_exif_data(p)), paths, sizes_bytes, **labels))
+                record(measure("read_form_tags", lambda p: [v for v in get_exif_data(p, FORM_TAGS).values()],
+                               paths, sizes_bytes, **labels))
+                updated = {}
+
+                def write(path):
+                    updated[path] = update_exif_data(path, update)
+                record(measure("write", write, paths, sizes_bytes, **labels))
+                record(measure("preview", lambda p: make_preview(updated[p]), paths, sizes_bytes, **labels))
+                for path in paths:
+                    os.remove(path)
+    lat, lon = update["GPSLatitude"], update["GPSLongitude"]
+    for count in poi_counts:
+        pois = synthetic_pois(count, seed)
+        record(measure("display_map", lambda _: map_html(display_map(lat, lon, pois[:NEAREST_POI_COUNT])),
+                       range(max(files // 4, 3)), pois=count))
+        for mode in ("markers", "cluster", "canvas"):
+            if mode == "markers" and count > 10 * POI_MARKER_LIMIT:
+                continue
+
+            def render(_, mode=mode):
+                poi_map = folium.Map(location=[0, 0], zoom_start=2)
+                add_pois(poi_map, pois, mode)
+                return map_html(poi_map)
+            record(measure("add_pois", render, range(max(files // 4, 3)), pois=count, mode=mode))
+    return {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "versions": {"pillow": Image.__version__, "numpy": np.__version__,
+                     "folium": folium.__version__},
+        "params": {"sizes": sizes, "densities": list(densities), "files": files,
+                   "poi_counts": list(poi_counts), "seed": seed},
+        "results": results,
+    }
+
+def format_bench_result(result):
+    """
+    Met en forme un résultat de mesure sur une ligne.
+    """
+    labels = " ".join(f"{key}={result[key]}" for key in ("corpus", "density", "pois", "mode")
+                      if key in result)
+    if result.get("mb_per_s") is not None:
+        rate = f"{result['files_per_s']:>9} files/s {result['mb_per_s']:>8} MB/s"
+    else:
+        rate = f"{result['files_per_s']:>9} maps/s"
+    rss = ("?" if result.get("rss_growth_mb") is None
+           else f"{result['peak_rss_mb']:.0f} (+{result['rss_growth_mb']:.1f})")
+    return (f"{result['stage']:<15} {labels:<32} {rate:<30} p50 {result['p50_ms']:>9} ms"
+            f"  p99 {result['p99_ms']:>9} ms  rss {rss} MiB"
+            f"  alloc {result.get('peak_traced_mb', 0):.1f} MiB")
+
+def compare_benchmarks(baseline, report):
+    """
+    Compare deux séries de mesures, par exemple celles de deux commits.
+
+    Args:
+        baseline (dict): Les mesures de référence (résultat de run_benchmarks).
+        report (dict): Les nouvelles mesures.
+
+    Returns:
+        list: Pour chaque mesure présente dans les deux séries, un dictionnaire
+              avec ses étiquettes, les latences p50 et leur rapport (nouveau / référence),
+              et les pics de mémoire de l'étape (None s'ils n'ont pas été mesurés).
+    """
+    def key(result):
+        return tuple((name, result[name]) for name in ("stage", "corpus", "density", "pois", "mode")
+                     if name in result)
+    reference = {key(result): result for result in baseline["results"]}
+    comparison = []
+    for result in report["results"]:
+        old = reference.get(key(result))
+        if old is None or not old["p50_ms"]:
+            continue
+        comparison.append({**dict(key(result)), "baseline_p50_ms": old["p50_ms"],
+                           "p50_ms": result["p50_ms"],
+                           "ratio": round(result["p50_ms"] / old["p50_ms"], 3),
+                           "baseline_rss_growth_mb": old.get("rss_growth_mb"),
+                           "rss_growth_mb": result.get("rss_growth_mb"),
+                           "baseline_peak_traced_mb": old.get("peak_traced_mb"),
+                           "peak_traced_mb": result.get("peak_traced_mb")})
+    return comparison
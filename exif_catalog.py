@@ -0,0 +1,511 @@
+"""
+Catalogue persistant des métadonnées EXIF (SQLite) et table de requêtes en colonnes.
+"""
+import json
+import operator
+import os
+import pathlib
+import sqlite3
+import zipfile
+
+import numpy as np
+from PIL.TiffImagePlugin import IFDRational
+
+from exif_io import content_digest, gps_coordinates, read_exif_data, to_float
+from exif_batch import (
+    BATCH_CHUNK_SIZE, EXIF_RECORD_NUMBER_FIELDS, EXIF_RECORD_TEXT_FIELDS, ExifRecord, chunked,
+    extract_records, iter_image_refs, map_chunks, ref_name,
+)
+
+# Catalogue persistant des métadonnées EXIF (SQLite)
+EXIF_CATALOG_PATH = os.environ.get("EXIF_CATALOG_PATH", "exif_catalog.sqlite")
+CATALOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS photos (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    hash TEXT,
+    make TEXT,
+    model TEXT,
+    datetime TEXT,
+    lat REAL,
+    lon REAL,
+    exif TEXT NOT NULL,
+    error TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS photos_make ON photos (make, model);
+CREATE INDEX IF NOT EXISTS photos_model ON photos (model);
+CREATE INDEX IF NOT EXISTS photos_datetime ON photos (datetime);
+CREATE INDEX IF NOT EXISTS photos_position ON photos (lat, lon);
+"""
+
+# Colonnes de la table de requêtes EXIF, par type, et opérations disponibles
+EXIF_TABLE_TEXT_COLUMNS = list(EXIF_RECORD_TEXT_FIELDS)
+EXIF_TABLE_NUMBER_COLUMNS = list(EXIF_RECORD_NUMBER_FIELDS)
+EXIF_TABLE_OPERATORS = {
+    "==": operator.eq, "!=": operator.ne, "<": operator.lt, "<=": operator.le,
+    ">": operator.gt, ">=": operator.ge, "between": None, "in": None,
+}
+EXIF_TABLE_AGGREGATES = ("count", "sum", "mean", "min", "max", "median")
+
+def _catalog_value(value):
+    """
+    Convertit une valeur EXIF en valeur JSON pour le catalogue.
+
+    Les rationnels deviennent des flottants ; les données binaires
+    (MakerNote, miniature...) ne sont pas conservées.
+    """
+    if isinstance(value, IFDRational):
+        return float(value) if value.denominator else None
+    if isinstance(value, (tuple, list)):
+        return [_catalog_value(item) for item in value]
+    if isinstance(value, (bytes, bytearray)):
+        return None
+    return value
+
+def catalog_entries_chunk(chunk):
+    """
+    Lit les métadonnées d'un lot de fichiers à (ré)indexer dans le catalogue.
+
+    Args:
+        chunk (list): Des quadruplets (chemin, taille, date de modification en ns,
+                      empreinte déjà calculée ou None).
+
+    Returns:
+        list: Les lignes de la table photos, dans l'ordre du lot.
+    """
+    entries = []
+    for path, size, mtime_ns, digest in chunk:
+        error = ""
+        try:
+            if digest is None:
+                digest = content_digest(path)
+            exif_data = read_exif_data(path)
+        except Exception as e:
+            digest, exif_data = None, {}
+            error = f"{type(e).__name__}: {e}"
+        lat, lon = gps_coordinates([exif_data])
+        exif_json = {tag: _catalog_value(value) for tag, value in exif_data.items()
+                     if isinstance(tag, str) and not isinstance(value, (bytes, bytearray))}
+        entries.append((
+            path, size, mtime_ns, digest,
+            str(exif_data.get("Make", "")) or None,
+            str(exif_data.get("Model", "")) or None,
+            str(exif_data.get("DateTime", "")) or None,
+            None if np.isnan(lat[0]) else float(lat[0]),
+            None if np.isnan(lon[0]) else float(lon[0]),
+            json.dumps(exif_json), error,
+        ))
+    return entries
+
+def _catalog_date(value):
+    """
+    Met une date saisie ('2023-05-01' ou '2023:05:01 12:00') au format EXIF.
+    """
+    value = str(value).strip().replace("T", " ")
+    date, _, time_part = value.partition(" ")
+    date = date.replace("-", ":")
+    return f"{date} {time_part}" if time_part else date
+
+class ExifCatalog:
+    """
+    Catalogue persistant (SQLite) des métadonnées EXIF d'une photothèque.
+
+    Chaque photo est identifiée par son chemin, sa taille, sa date de
+    modification et l'empreinte de son contenu. Une nouvelle analyse ne relit
+    que les fichiers modifiés, et les requêtes sur Make, Model, DateTime et la
+    position GPS passent par des index, sans relire aucune image.
+    """
+
+    def __init__(self, path=EXIF_CATALOG_PATH, read_only=False):
+        self.path = path
+        if read_only:
+            # Ouvert en lecture seule, le fichier n'est jamais créé ni modifié
+            uri = pathlib.Path(path).absolute().as_uri() + "?mode=ro"
+            self._conn = sqlite3.connect(uri, uri=True)
+        else:
+            self._conn = sqlite3.connect(path)
+        self._conn.row_factory = sqlite3.Row
+        if not read_only:
+            with self._conn:
+                self._conn.executescript(CATALOG_SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM photos").fetchone()[0]
+
+    def _stale_files(self, source, stats):
+        """
+        Énumère les fichiers de source absents du catalogue ou modifiés depuis.
+
+        Un fichier dont la taille et la date de modification n'ont pas changé
+        n'est pas relu ; un fichier modifié mais de même empreinte voit
+        seulement ses informations de fichier mises à jour. Les chemins sont
+        absolus et sans lien symbolique, quel que soit le dossier courant.
+
+        Yields:
+            tuple: (chemin, taille, date de modification en ns, empreinte déjà
+                   calculée ou None).
+        """
+        for name, ref in iter_image_refs(source):
+            ref = os.path.realpath(ref)
+            try:
+                st_result = os.stat(ref)
+            except OSError:
+                continue
+            row = self._conn.execute("SELECT size, mtime_ns, hash FROM photos WHERE path = ?",
+                                     (ref,)).fetchone()
+            if row is not None and (row["size"], row["mtime_ns"]) == (st_result.st_size,
+                                                                       st_result.st_mtime_ns):
+                stats["unchanged"] += 1
+                continue
+            digest = None
+            if row is not None and row["hash"] is not None:
+                digest = content_digest(ref)
+                if row["hash"] == digest:
+                    with self._conn:
+                        self._conn.execute("UPDATE photos SET size = ?, mtime_ns = ? WHERE path = ?",
+                                           (st_result.st_size, st_result.st_mtime_ns, ref))
+                    stats["unchanged"] += 1
+                    continue
+            stats["updated" if row is not None else "added"] += 1
+            # L'empreinte déjà calculée est transmise, pour ne pas relire le fichier
+            yield ref, st_result.st_size, st_result.st_mtime_ns, digest
+
+    def scan(self, source, workers=1, chunk_size=BATCH_CHUNK_SIZE, prune=True):
+        """
+        Analyse un dossier ou un motif glob et met le catalogue à jour.
+
+        Args:
+            source (str): Un dossier (parcouru récursivement) ou un motif glob.
+            workers (int): Le nombre de processus de lecture des métadonnées.
+            chunk_size (int): Le nombre de fichiers par lot envoyé à un processus.
+            prune (bool): Retirer du catalogue les fichiers qui n'existent plus.
+
+        Returns:
+            dict: Le nombre de fichiers ajoutés, mis à jour, inchangés et retirés.
+        """
+        if not os.path.isdir(source) and zipfile.is_zipfile(source):
+            raise ValueError("Only directories and glob patterns can be cataloged")
+        stats = {"added": 0, "updated": 0, "unchanged": 0, "removed": 0}
+        chunks = chunked(self._stale_files(source, stats), chunk_size)
+        for entries in map_chunks(catalog_entries_chunk, chunks, workers=workers, ordered=False):
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO photos (path, size, mtime_ns, hash, make, model,"
+                    " datetime, lat, lon, exif, error) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    entries)
+        if prune:
+            stats["removed"] = self.prune()
+        return stats
+
+    def prune(self):
+        """
+        Retire du catalogue les fichiers qui n'existent plus.
+
+        Les chemins relatifs des catalogues antérieurs sont aussi retirés :
+        une nouvelle analyse les remplace par des chemins absolus.
+
+        Returns:
+            int: Le nombre de fichiers retirés.
+        """
+        missing = [(path,) for (path,) in self._conn.execute("SELECT path FROM photos")
+                   if not os.path.isabs(path) or not os.path.exists(path)]
+        with self._conn:
+            self._conn.executemany("DELETE FROM photos WHERE path = ?", missing)
+        return len(missing)
+
+    def records(self):
+        """
+        Énumère les métadonnées de toutes les photos du catalogue.
+
+        Yields:
+            tuple: (chemin, dictionnaire EXIF), triés par chemin.
+        """
+        for row in self._conn.execute("SELECT path, exif FROM photos ORDER BY path"):
+            yield row["path"], json.loads(row["exif"])
+
+    def query(self, make=None, model=None, since=None, until=None, bbox=None, limit=None):
+        """
+        Recherche des photos dans le catalogue.
+
+        Args:
+            make (str): La marque de l'appareil.
+            model (str): Le modèle de l'appareil.
+            since (str): La date minimale ('AAAA:MM:JJ HH:MM:SS', ou un préfixe).
+            until (str): La date maximale, incluse (même format).
+            bbox (tuple): (sud, ouest, nord, est) en degrés décimaux ; ouest > est
+                          pour un rectangle qui traverse l'antiméridien.
+            limit (int): Le nombre maximal de photos renvoyées.
+
+        Returns:
+            list: Des dictionnaires (path, size, mtime_ns, hash, make, model,
+                  datetime, lat, lon, exif, error), triés par date puis chemin.
+        """
+        clauses, params = [], []
+        if make is not None:
+            clauses.append("make = ?")
+            params.append(make)
+        if model is not None:
+            clauses.append("model = ?")
+            params.append(model)
+        if since is not None:
+            clauses.append("datetime >= ?")
+            params.append(_catalog_date(since))
+        if until is not None:
+            # Une date partielle inclut toute la période qu'elle désigne
+            clauses.append("datetime <= ?")
+            params.append(_catalog_date(until) + "\uffff")
+        if bbox is not None:
+            south, west, north, east = bbox
+            clauses.append("lat BETWEEN ? AND ?")
+            params += [south, north]
+            if west <= east:
+                clauses.append("lon BETWEEN ? AND ?")
+                params += [west, east]
+            else:
+                clauses.append("(lon >= ? OR lon <= ?)")
+                params += [west, east]
+        sql = "SELECT * FROM photos"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY datetime, path"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        rows = []
+        for row in self._conn.execute(sql, params):
+            row = dict(row)
+            row["exif"] = json.loads(row["exif"])
+            rows.append(row)
+        return rows
+
+def _to_datetime64(value):
+    """
+    Convertit une date EXIF ('AAAA:MM:JJ HH:MM:SS') ou ISO en numpy.datetime64.
+
+    Returns:
+        numpy.datetime64: La date à la seconde près, NaT si elle est illisible.
+    """
+    if isinstance(value, np.datetime64):
+        return value.astype("datetime64[s]")
+    text = _catalog_date(value) if value not in (None, "") else ""
+    date, _, time_part = text.partition(" ")
+    try:
+        return np.datetime64(date.replace(":", "-") + ("T" + time_part if time_part else ""), "s")
+    except ValueError:
+        return np.datetime64("NaT", "s")
+
+class ExifTable:
+    """
+    Table en colonnes des métadonnées EXIF d'un ensemble de photos.
+
+    Chaque colonne est un tableau NumPy typé : flottants pour ExposureTime,
+    FNumber, ISOSpeedRatings et la position GPS, datetime64 pour DateTime,
+    objets pour les textes. Les filtres et les regroupements sont vectorisés
+    et ne relisent aucune image. La colonne 'error' décrit les images qui
+    n'ont pas pu être lues.
+    """
+
+    def __init__(self, columns):
+        self.columns = columns
+
+    @classmethod
+    def from_records(cls, records, paths=None):
+        """
+        Construit la table à partir de dictionnaires EXIF ou de lignes d'export.
+
+        Args:
+            records (list): Des dictionnaires renvoyés par get_exif_data, des
+                            enregistrements ExifRecord ou des lignes d'export.
+            paths (list): Le chemin de chaque photo ; la source des
+                          enregistrements ExifRecord ou la clé 'path' si absent.
+
+        Returns:
+            ExifTable: La table construite.
+        """
+        records = list(records)
+        if paths is None:
+            paths = [ref_name(record.source) if isinstance(record, ExifRecord)
+                     else record.get("path", "") for record in records]
+        columns = {"path": np.array(paths, dtype=object)}
+        for name in EXIF_TABLE_TEXT_COLUMNS:
+            columns[name] = np.array([str(record.get(name, "")).strip("\x00 ")
+                                      for record in records], dtype=object)
+        for name in EXIF_TABLE_NUMBER_COLUMNS:
+            columns[name] = np.array([to_float(record.get(name)) for record in records],
+                                     dtype=float)
+        columns["DateTime"] = np.array([_to_datetime64(record.get("DateTime"))
+                                        for record in records], dtype="datetime64[s]")
+        columns["lat"], columns["lon"] = gps_coordinates(records)
+        columns["error"] = np.array([record.error if isinstance(record, ExifRecord)
+                                     else record.get("error") or "" for record in records],
+                                    dtype=object)
+        return cls(columns)
+
+    @classmethod
+    def from_source(cls, source, workers=1):
+        """
+        Construit la table en lisant les images d'un dossier, d'un motif glob
+        ou d'une archive ZIP (voir extract_records).
+
+        Args:
+            source (str): Un dossier, un motif glob ou une archive ZIP.
+            workers (int): Le nombre de processus d'extraction.
+
+        Returns:
+            ExifTable: La table construite, une ligne par image, lisible ou non.
+        """
+        return cls.from_records(extract_records(source, workers=workers))
+
+    @classmethod
+    def from_catalog(cls, catalog):
+        """
+        Construit la table à partir du catalogue persistant, sans relire les images.
+
+        Args:
+            catalog (ExifCatalog): Le catalogue à charger.
+
+        Returns:
+            ExifTable: La table construite.
+        """
+        paths, records = [], []
+        for path, exif_data in catalog.records():
+            paths.append(path)
+            records.append(exif_data)
+        return cls.from_records(records, paths=paths)
+
+    def __len__(self):
+        return len(self.columns["path"])
+
+    def take(self, selection):
+        """
+        Renvoie la sous-table des lignes sélectionnées (masque ou positions).
+        """
+        return ExifTable({name: values[selection] for name, values in self.columns.items()})
+
+    def mask(self, column, op, value):
+        """
+        Évalue une condition sur une colonne, pour toutes les lignes à la fois.
+
+        Args:
+            column (str): Le nom de la colonne.
+            op (str): '==', '!=', '<', '<=', '>', '>=', 'between' (bornes
+                      incluses, value est un couple) ou 'in' (value est une liste).
+            value: La valeur de comparaison, convertie au type de la colonne.
+
+        Returns:
+            numpy.ndarray: Un masque booléen ; une valeur absente (NaN, NaT,
+                           texte vide) ne satisfait aucune condition.
+        """
+        if column not in self.columns:
+            raise KeyError(f"Unknown column: {column}")
+        if op not in EXIF_TABLE_OPERATORS:
+            raise ValueError(f"Unknown operator: {op}")
+        values = self.columns[column]
+        if op == "between":
+            low, high = value
+            return self.mask(column, ">=", low) & self.mask(column, "<=", high)
+        if op == "in":
+            return np.isin(values, [self._cast(column, item) for item in value])
+        return EXIF_TABLE_OPERATORS[op](values, self._cast(column, value)) & self._present(column)
+
+    def _cast(self, column, value):
+        kind = self.columns[column].dtype.kind
+        if kind == "M":
+            return _to_datetime64(value)
+        if kind == "f":
+            return to_float(value)
+        return value
+
+    def _present(self, column):
+        values = self.columns[column]
+        if values.dtype.kind == "M":
+            return ~np.isnat(values)
+        if values.dtype.kind == "f":
+            return ~np.isnan(values)
+        return values != ""
+
+    def filter(self, conditions):
+        """
+        Renvoie les lignes qui satisfont toutes les conditions.
+
+        Exemple : table.filter([("Model", "==", "X"), ("ISOSpeedRatings", ">", 3200),
+                                ("DateTime", "between", ("2023-01-01", "2023-12-31"))])
+
+        Args:
+            conditions (list): Des triplets (colonne, opérateur, valeur).
+
+        Returns:
+            ExifTable: La sous-table des lignes retenues.
+        """
+        selected = np.ones(len(self), dtype=bool)
+        for column, op, value in conditions:
+            selected &= self.mask(column, op, value)
+        return self.take(selected)
+
+    def group_by(self, by, column=None, func="count"):
+        """
+        Regroupe les lignes selon une colonne et agrège une autre colonne.
+
+        Args:
+            by (str): La colonne de regroupement ; les valeurs absentes sont ignorées.
+            column (str): La colonne numérique agrégée (inutile pour 'count').
+            func (str): 'count', 'sum', 'mean', 'min', 'max' ou 'median'.
+
+        Returns:
+            list: Des couples (valeur du groupe, agrégat), triés par groupe.
+        """
+        if func not in EXIF_TABLE_AGGREGATES:
+            raise ValueError(f"Unknown aggregate: {func}")
+        present = self._present(by)
+        keys = self.columns[by][present]
+        if func == "count":
+            groups, counts = np.unique(keys, return_counts=True)
+            return list(zip(groups.tolist(), counts.tolist()))
+        values = self.columns[column][present].astype(float)
+        valid = ~np.isnan(values)
+        groups, inverse = np.unique(keys[valid], return_inverse=True)
+        values = values[valid]
+        if func in ("sum", "mean"):
+            totals = np.bincount(inverse, weights=values, minlength=len(groups))
+            if func == "mean":
+                totals /= np.bincount(inverse, minlength=len(groups))
+            results = totals
+        elif func in ("min", "max"):
+            ufunc = np.minimum if func == "min" else np.maximum
+            results = np.full(len(groups), np.inf if func == "min" else -np.inf)
+            ufunc.at(results, inverse, values)
+        else:
+            # Tri par groupe puis par valeur : chaque groupe devient une tranche contiguë
+            order = np.lexsort((values, inverse))
+            bounds = np.searchsorted(inverse[order], np.arange(len(groups) + 1))
+            results = np.array([np.median(values[order][start:end])
+                                for start, end in zip(bounds[:-1], bounds[1:])])
+        return list(zip(groups.tolist(), results.tolist()))
+
+    def to_rows(self, limit=None):
+        """
+        Renvoie les lignes de la table sous forme de dictionnaires, pour l'affichage.
+        """
+        count = len(self) if limit is None else min(limit, len(self))
+        rows = []
+        for i in range(count):
+            row = {}
+            for name, values in self.columns.items():
+                value = values[i]
+                if values.dtype.kind == "M":
+                    value = "" if np.isnat(value) else str(value).replace("T", " ")
+                elif values.dtype.kind == "f":
+                    value = None if np.isnan(value) else float(value)
+                row[name] = value
+            rows.append(row)
+        return rows
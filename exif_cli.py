@@ -0,0 +1,265 @@
+"""
+Commandes en ligne de commande : read, write, map, batch, catalog et bench.
+"""
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+from PIL.TiffImagePlugin import IFDRational
+
+from exif_io import (
+    EXIF_PREVIEW_VALUE_BYTES, GPS_COORDINATE_TAGS, apply_gps_signs, gps_coordinates,
+    read_exif_data, update_exif_data, validate_exif_data,
+)
+from poi_maps import NEARBY_RADIUS_KM, display_map, map_html, poi_index_for
+from exif_batch import BATCH_CHUNK_SIZE, BATCH_WRITERS, make_progress_printer, run_batch
+from exif_catalog import EXIF_CATALOG_PATH, ExifCatalog
+from exif_bench import (
+    BENCH_IMAGE_SIZES, BENCH_POI_COUNTS, BENCH_TAG_DENSITIES, compare_benchmarks,
+    format_bench_result, run_benchmarks,
+)
+
+def batch_main(argv=None):
+    """
+    Point d'entrée en ligne de commande du traitement par lot.
+
+    Exemple : python exo4.2.py batch photos/ exif.csv
+    """
+    parser = argparse.ArgumentParser(prog="exo4.2.py batch",
+                                     description="Bulk EXIF extraction to CSV, JSON Lines or Parquet.")
+    parser.add_argument("source", help="directory, glob pattern or ZIP archive")
+    parser.add_argument("output", help="output file (.csv, .jsonl or .parquet)")
+    parser.add_argument("--format", choices=sorted(BATCH_WRITERS), help="output format")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="number of worker processes (default: all cores)")
+    parser.add_argument("--chunk-size", type=int, default=BATCH_CHUNK_SIZE,
+                        help="images sent to a worker at a time")
+    parser.add_argument("--unordered", action="store_true",
+                        help="write rows as soon as they are ready")
+    parser.add_argument("--pois", help="CSV catalog (name, lat, lon) for the nearest POI columns")
+    parser.add_argument("--quiet", action="store_true", help="do not report progress")
+    args = parser.parse_args(argv)
+    count = run_batch(args.source, args.output, args.format,
+                      progress=None if args.quiet else make_progress_printer(),
+                      workers=args.workers, chunk_size=args.chunk_size,
+                      ordered=not args.unordered, poi_catalog=args.pois)
+    if not args.quiet:
+        print(f"\r{count} images written to {args.output}", file=sys.stderr)
+    return 0
+
+def catalog_main(argv=None):
+    """
+    Point d'entrée en ligne de commande du catalogue EXIF.
+
+    Exemple : python exo4.2.py catalog --scan photos/ --make Canon
+    """
+    parser = argparse.ArgumentParser(prog="exo4.2.py catalog",
+                                     description="Persistent EXIF catalog with incremental rescans.")
+    parser.add_argument("--db", default=EXIF_CATALOG_PATH, help="SQLite catalog file")
+    parser.add_argument("--scan", metavar="SOURCE", help="directory or glob pattern to (re)scan")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="number of worker processes (default: all cores)")
+    parser.add_argument("--make", help="camera make")
+    parser.add_argument("--model", help="camera model")
+    parser.add_argument("--since", help="earliest DateTime (e.g. 2023-05-01)")
+    parser.add_argument("--until", help="latest DateTime, inclusive")
+    parser.add_argument("--bbox", nargs=4, type=float, metavar=("SOUTH", "WEST", "NORTH", "EAST"),
+                        help="GPS bounding box in decimal degrees")
+    parser.add_argument("--limit", type=int, help="maximum number of photos listed")
+    args = parser.parse_args(argv)
+    with ExifCatalog(args.db) as catalog:
+        if args.scan:
+            stats = catalog.scan(args.scan, workers=args.workers)
+            print(", ".join(f"{count} {state}" for state, count in stats.items()), file=sys.stderr)
+        if args.scan is None or any(v is not None for v in (args.make, args.model, args.since,
+                                                             args.until, args.bbox, args.limit)):
+            for row in catalog.query(args.make, args.model, args.since, args.until,
+                                     args.bbox, args.limit):
+                print(json.dumps(row, ensure_ascii=False))
+    return 0
+
+def bench_main(argv=None):
+    """
+    Point d'entrée en ligne de commande des mesures de performance.
+
+    Exemple : python exo4.2.py bench --output bench.json
+    """
+    parser = argparse.ArgumentParser(prog="exo4.2.py bench",
+                                     description="Benchmark EXIF read/write, previews and map rendering.")
+    parser.add_argument("--output", default="bench_results.json", help="JSON results file")
+    parser.add_argument("--sizes", nargs="+", choices=sorted(BENCH_IMAGE_SIZES),
+                        default=list(BENCH_IMAGE_SIZES), help="image corpora to generate")
+    parser.add_argument("--densities", nargs="+", choices=list(BENCH_TAG_DENSITIES),
+                        default=list(BENCH_TAG_DENSITIES), help="EXIF tag densities")
+    parser.add_argument("--files", type=int, default=20, help="files per corpus")
+    parser.add_argument("--pois", nargs="+", type=int, default=list(BENCH_POI_COUNTS),
+                        help="POI counts for the map benchmarks")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic data")
+    parser.add_argument("--baseline", help="previous JSON results to compare against")
+    args = parser.parse_args(argv)
+    report = run_benchmarks({name: BENCH_IMAGE_SIZES[name] for name in args.sizes},
+                            args.densities, args.files, args.pois, args.seed,
+                            progress=lambda result: print(format_bench_result(result)))
+    with open(args.output, "w", encoding="utf-8") as fp:
+        json.dump(report, fp, indent=2)
+    print(f"Results written to {args.output}", file=sys.stderr)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fp:
+            baseline = json.load(fp)
+        print(f"p50 latency and memory peaks vs {args.baseline} (commit {baseline.get('commit')}):")
+        def mb(value, spec=".1f"):
+            return "?" if value is None else format(value, spec)
+        for entry in compare_benchmarks(baseline, report):
+            labels = " ".join(f"{name}={value}" for name, value in entry.items()
+                              if name in ("stage", "corpus", "density", "pois", "mode"))
+            print(f"  {labels:<48} {entry['baseline_p50_ms']:>9} -> {entry['p50_ms']:>9} ms"
+                  f"  x{entry['ratio']}"
+                  f"  rss {mb(entry['baseline_rss_growth_mb'], '+.1f')} -> {mb(entry['rss_growth_mb'], '+.1f')} MiB"
+                  f"  alloc {mb(entry['baseline_peak_traced_mb'])} -> {mb(entry['peak_traced_mb'])} MiB")
+    return 0
+
+def _json_value(value):
+    """
+    Convertit une valeur EXIF en valeur JSON pour la ligne de commande.
+    """
+    if isinstance(value, IFDRational):
+        return float(value) if value.denominator else None
+    if isinstance(value, (tuple, list)):
+        return [_json_value(item) for item in value]
+    if isinstance(value, (bytes, bytearray)):
+        return value.hex()
+    return value
+
+def read_main(argv=None):
+    """
+    Affiche les métadonnées EXIF d'images, une ligne JSON par image.
+
+    Exemple : python exo4.2.py read photo.jpg --tags DateTime GPSLatitude
+    """
+    parser = argparse.ArgumentParser(prog="exo4.2.py read",
+                                     description="Print EXIF metadata as JSON Lines.")
+    parser.add_argument("images", nargs="+", help="JPEG files")
+    parser.add_argument("--tags", nargs="+", help="only these tags (e.g. DateTime GPSLatitude)")
+    parser.add_argument("--full", action="store_true",
+                        help=f"also decode values larger than {EXIF_PREVIEW_VALUE_BYTES} bytes")
+    args = parser.parse_args(argv)
+    status = 0
+    for path in args.images:
+        try:
+            exif_data = read_exif_data(path, args.tags)
+        except Exception as e:
+            print(f"{path}: {type(e).__name__}: {e}", file=sys.stderr)
+            status = 1
+            continue
+        values = dict(exif_data) if args.full else exif_data.preview()
+        print(json.dumps({"path": path, "exif": {str(tag): _json_value(value)
+                                                 for tag, value in values.items()}},
+                         ensure_ascii=False))
+    return status
+
+def _parse_assignments(assignments):
+    """
+    Convertit des affectations 'Tag=valeur' en dictionnaire {tag: valeur}.
+    """
+    values = {}
+    for assignment in assignments:
+        tag_name, sep, value = assignment.partition("=")
+        if not sep or not tag_name:
+            raise ValueError(f"Expected TAG=VALUE, got {assignment!r}")
+        values[tag_name.strip()] = value.strip()
+    return values
+
+def write_main(argv=None):
+    """
+    Modifie les métadonnées EXIF d'une image, sans ré-encoder ses pixels.
+
+    Exemple : python exo4.2.py write photo.jpg -o out.jpg --set Make=Canon GPSLatitude=-33.85
+    """
+    parser = argparse.ArgumentParser(prog="exo4.2.py write",
+                                     description="Update EXIF tags losslessly.")
+    parser.add_argument("image", help="JPEG file to update")
+    parser.add_argument("--set", nargs="+", required=True, metavar="TAG=VALUE",
+                        help="tags to write; GPS coordinates may be signed decimal degrees")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("-o", "--output", help="updated JPEG file")
+    target.add_argument("--in-place", action="store_true", help="overwrite the input file")
+    args = parser.parse_args(argv)
+    try:
+        updated_exif = apply_gps_signs(_parse_assignments(args.set))
+    except ValueError as e:
+        parser.error(str(e))
+    errors = validate_exif_data(updated_exif)
+    for tag_name, message in errors.items():
+        print(f"{tag_name}: {message}", file=sys.stderr)
+    if errors:
+        return 1
+    try:
+        updated_image = update_exif_data(args.image, updated_exif)
+    except (OSError, ValueError) as e:
+        print(f"{args.image}: {e}", file=sys.stderr)
+        return 1
+    output = args.image if args.in_place else args.output
+    # Le fichier est remplacé en une fois, pour ne jamais laisser une image à moitié écrite
+    tmp_path = f"{output}.tmp"
+    with open(tmp_path, "wb") as fp:
+        fp.write(updated_image)
+    os.replace(tmp_path, output)
+    return 0
+
+def map_main(argv=None):
+    """
+    Produit la carte HTML de la position d'une image et des POI proches.
+
+    Exemple : python exo4.2.py map photo.jpg -o map.html
+    """
+    parser = argparse.ArgumentParser(prog="exo4.2.py map",
+                                     description="Render the map of a photo's GPS position to HTML.")
+    parser.add_argument("image", nargs="?", help="JPEG file with GPS tags")
+    parser.add_argument("--lat", type=float, help="latitude, instead of an image")
+    parser.add_argument("--lon", type=float, help="longitude, instead of an image")
+    parser.add_argument("-o", "--output", default="map.html", help="HTML output file")
+    parser.add_argument("--radius", type=float, default=NEARBY_RADIUS_KM,
+                        help="radius of the nearby POIs, in km")
+    parser.add_argument("--pois", help="CSV catalog (name, lat, lon) instead of the built-in POIs")
+    args = parser.parse_args(argv)
+    if args.image is not None:
+        exif_data = read_exif_data(args.image, GPS_COORDINATE_TAGS | {"GPSLatitudeRef", "GPSLongitudeRef"})
+        lat, lon = (float(values[0]) for values in gps_coordinates([exif_data]))
+    elif args.lat is not None and args.lon is not None:
+        lat, lon = args.lat, args.lon
+    else:
+        parser.error("give an image or both --lat and --lon")
+    if np.isnan(lat) or np.isnan(lon):
+        print(f"{args.image}: no GPS position", file=sys.stderr)
+        return 1
+    nearby = [poi for poi, _ in poi_index_for(args.pois).within_radius(lat, lon, args.radius)]
+    with open(args.output, "w", encoding="utf-8") as fp:
+        fp.write(map_html(display_map(lat, lon, nearby)))
+    print(f"Map of ({lat:.6f}, {lon:.6f}) with {len(nearby)} nearby POIs written to {args.output}",
+          file=sys.stderr)
+    return 0
+
+def cli_main(argv=None):
+    """
+    Point d'entrée en ligne de commande, sans démarrer Streamlit.
+
+    Exemple : python exo4.2.py read photo.jpg
+    """
+    commands = {
+        "read": (read_main, "print EXIF metadata as JSON Lines"),
+        "write": (write_main, "update EXIF tags losslessly"),
+        "map": (map_main, "render a photo's position and nearby POIs to HTML"),
+        "batch": (batch_main, "bulk EXIF extraction to CSV, JSON Lines or Parquet"),
+        "catalog": (catalog_main, "persistent EXIF catalog with incremental rescans"),
+        "bench": (bench_main, "benchmark the EXIF and map pipeline"),
+    }
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or argv[0] not in commands:
+        print("usage: python exo4.2.py {" + ",".join(commands) + "} ...", file=sys.stderr)
+        for name, (_, help_text) in commands.items():
+            print(f"  {name:<8} {help_text}", file=sys.stderr)
+        print("Run 'streamlit run exo4.2.py' for the web application.", file=sys.stderr)
+        return 0 if argv[:1] in (["-h"], ["--help"]) else 2
+    return commands[argv[0]][0](argv[1:])
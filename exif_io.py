@@ -0,0 +1,1266 @@
+"""
+Lecture et écriture des métadonnées EXIF des fichiers JPEG, sans ré-encodage de l'image.
+"""
+import functools
+import hashlib
+import io
+import mmap
+import os
+import struct
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+from fractions import Fraction
+
+import numpy as np
+from PIL import Image, ExifTags, TiffTags
+from PIL.TiffImagePlugin import IFDRational
+
+# Marqueurs JPEG utilisés pour parcourir l'en-tête du fichier
+JPEG_SOI = b"\xff\xd8"
+JPEG_APP1 = 0xE1
+JPEG_SOS = 0xDA
+JPEG_EOI = 0xD9
+EXIF_HEADER = b"Exif\x00\x00"
+
+# Pointeurs vers les sous-IFD EXIF et GPS dans l'IFD0
+EXIF_IFD_POINTER = 0x8769
+GPS_IFD_POINTER = 0x8825
+
+# Position et taille de la miniature JPEG dans l'IFD1
+THUMBNAIL_OFFSET = 0x0201
+THUMBNAIL_LENGTH = 0x0202
+
+# Types TIFF : code -> (format struct, taille en octets d'un élément)
+TIFF_TYPES = {
+    1: ("B", 1),    # BYTE
+    2: ("B", 1),    # ASCII
+    3: ("H", 2),    # SHORT
+    4: ("L", 4),    # LONG
+    5: ("L", 8),    # RATIONAL (deux LONG)
+    6: ("b", 1),    # SBYTE
+    7: ("B", 1),    # UNDEFINED
+    8: ("h", 2),    # SSHORT
+    9: ("l", 4),    # SLONG
+    10: ("l", 8),   # SRATIONAL (deux SLONG)
+    11: ("f", 4),   # FLOAT
+    12: ("d", 8),   # DOUBLE
+    13: ("L", 4),   # IFD
+}
+
+# Au-delà de cette taille (en octets), une valeur EXIF n'est pas décodée pour l'affichage
+EXIF_PREVIEW_VALUE_BYTES = 256
+
+# Taille maximale du contenu d'un segment JPEG (champ de longueur sur 16 bits)
+MAX_SEGMENT_SIZE = 0xFFFF - 2
+
+# Budget mémoire par défaut du cache des métadonnées EXIF (en octets)
+EXIF_CACHE_MAX_BYTES = int(os.environ.get("EXIF_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+
+# Aperçus : taille maximale (en pixels) et budget mémoire de leur cache
+PREVIEW_MAX_SIZE = 1024
+PREVIEW_CACHE_MAX_BYTES = int(os.environ.get("PREVIEW_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+# Coordonnées GPS enregistrées en degrés, minutes, secondes
+GPS_COORDINATE_TAGS = {"GPSLatitude", "GPSLongitude", "GPSDestLatitude", "GPSDestLongitude"}
+
+# Références (N/S, E/W) et coordonnées qu'elles qualifient
+GPS_REF_COORDINATES = {"GPSLatitudeRef": "GPSLatitude", "GPSLongitudeRef": "GPSLongitude"}
+
+# Pointeur de chaque sous-IFD dans l'IFD0
+SUB_IFD_POINTERS = {"Exif": EXIF_IFD_POINTER, "GPS": GPS_IFD_POINTER}
+
+# Tags de l'IFD EXIF et leur type TIFF (norme EXIF 2.32)
+EXIF_IFD_TYPES = {
+    0x829A: 5, 0x829D: 5, 0x8822: 3, 0x8824: 2, 0x8827: 3, 0x8828: 7,
+    0x8830: 3, 0x8831: 4, 0x8832: 4, 0x8833: 4, 0x8834: 4, 0x8835: 4,
+    0x9000: 7, 0x9003: 2, 0x9004: 2, 0x9010: 2, 0x9011: 2, 0x9012: 2,
+    0x9101: 7, 0x9102: 5, 0x9201: 10, 0x9202: 5, 0x9203: 10, 0x9204: 10,
+    0x9205: 5, 0x9206: 5, 0x9207: 3, 0x9208: 3, 0x9209: 3, 0x920A: 5,
+    0x9214: 3, 0x927C: 7, 0x9286: 7, 0x9290: 2, 0x9291: 2, 0x9292: 2,
+    0x9400: 10, 0x9401: 5, 0x9402: 5, 0x9403: 10, 0x9404: 5, 0x9405: 10,
+    0xA000: 7, 0xA001: 3, 0xA002: 4, 0xA003: 4, 0xA004: 2, 0xA005: 4,
+    0xA20B: 5, 0xA20C: 7, 0xA20E: 5, 0xA20F: 5, 0xA210: 3, 0xA214: 3,
+    0xA215: 5, 0xA217: 3, 0xA300: 7, 0xA301: 7, 0xA302: 7, 0xA401: 3,
+    0xA402: 3, 0xA403: 3, 0xA404: 5, 0xA405: 3, 0xA406: 3, 0xA407: 3,
+    0xA408: 3, 0xA409: 3, 0xA40A: 3, 0xA40B: 7, 0xA40C: 3, 0xA420: 2,
+    0xA430: 2, 0xA431: 2, 0xA432: 5, 0xA433: 2, 0xA434: 2, 0xA435: 2,
+    0xA500: 5,
+}
+
+# Tags de l'IFD GPS et leur type TIFF
+GPS_IFD_TYPES = {
+    0: 1, 1: 2, 2: 5, 3: 2, 4: 5, 5: 1, 6: 5, 7: 5, 8: 2, 9: 2, 10: 2,
+    11: 5, 12: 2, 13: 5, 14: 2, 15: 5, 16: 2, 17: 5, 18: 2, 19: 2, 20: 5,
+    21: 2, 22: 5, 23: 2, 24: 5, 25: 2, 26: 5, 27: 7, 28: 7, 29: 2, 30: 3,
+    31: 5,
+}
+
+def iter_jpeg_segments(fp):
+    """
+    Parcourt les segments de l'en-tête JPEG jusqu'au marqueur SOS.
+
+    Après chaque segment renvoyé, le fichier est positionné au début de son
+    contenu ; le générateur se replace ensuite à la fin du segment, si bien
+    que le contenu des segments non lus n'est jamais chargé.
+
+    Args:
+        fp: Un fichier binaire ouvert, positionné au début du JPEG.
+
+    Yields:
+        tuple: (marqueur, position du marqueur, position de fin du segment).
+
+    Raises:
+        ValueError: Si le fichier n'est pas un JPEG ou si l'en-tête s'arrête avant SOS.
+    """
+    if fp.read(2) != JPEG_SOI:
+        raise ValueError("Not a JPEG file")
+    while True:
+        byte = fp.read(1)
+        if not byte:
+            raise ValueError("Truncated JPEG header")
+        if byte != b"\xff":
+            continue
+        start = fp.tell() - 1
+        marker = fp.read(1)
+        # Les octets 0xFF supplémentaires sont du remplissage
+        while marker == b"\xff":
+            start = fp.tell() - 1
+            marker = fp.read(1)
+        if not marker:
+            raise ValueError("Truncated JPEG header")
+        marker = marker[0]
+        if marker == JPEG_SOS:
+            return
+        if marker == JPEG_EOI:
+            raise ValueError("JPEG file ends before the image data")
+        if marker == 0x01 or 0xD0 <= marker <= 0xD7:
+            # Marqueurs autonomes, sans champ de longueur
+            continue
+        header = fp.read(2)
+        if len(header) < 2:
+            raise ValueError("Truncated JPEG header")
+        length = struct.unpack(">H", header)[0]
+        if length < 2:
+            raise ValueError(f"Invalid JPEG segment length {length}")
+        end = fp.tell() + length - 2
+        yield marker, start, end
+        fp.seek(end)
+
+def read_exif_segment(fp):
+    """
+    Renvoie le bloc TIFF du segment APP1 EXIF d'un JPEG.
+
+    Seuls les en-têtes des segments sont lus : les autres segments sont
+    sautés avec seek() et la lecture s'arrête au marqueur SOS, avant les
+    données compressées de l'image.
+
+    Args:
+        fp: Un fichier binaire ouvert, positionné au début du JPEG.
+
+    Returns:
+        bytes: Le contenu TIFF du segment EXIF, ou None s'il n'y en a pas.
+
+    Raises:
+        ValueError: Si le fichier n'est pas un JPEG valide.
+    """
+    for marker, start, end in iter_jpeg_segments(fp):
+        if marker == JPEG_APP1:
+            payload = fp.read(end - fp.tell())
+            if fp.tell() < end:
+                raise ValueError("Truncated JPEG header")
+            if payload.startswith(EXIF_HEADER):
+                return payload[len(EXIF_HEADER):]
+    return None
+
+class BufferReader:
+    """
+    Fichier binaire en lecture seule sur un tampon partagé (bytes, memoryview, mmap).
+
+    Le tampon n'est jamais recopié : seuls les octets demandés à read() le
+    sont, si bien que lire l'en-tête d'un JPEG ne coûte que quelques Ko.
+    """
+
+    def __init__(self, buffer):
+        self._view = memoryview(buffer).cast("B")
+        self._pos = 0
+
+    def read(self, size=-1):
+        end = len(self._view) if size is None or size < 0 else min(self._pos + size, len(self._view))
+        data = bytes(self._view[self._pos:end])
+        self._pos = max(self._pos, end)
+        return data
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        if offset < 0:
+            raise ValueError("negative seek position")
+        self._pos = offset
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+    def close(self):
+        # Libère le tampon, pour qu'un mmap sous-jacent puisse être fermé
+        self._view.release()
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+def map_image_file(path):
+    """
+    Projette un fichier image en mémoire, en lecture seule.
+
+    Le contenu n'est pas lu : seules les pages effectivement consultées sont
+    chargées, depuis le cache de pages du système si le fichier y est déjà.
+
+    Args:
+        path (str): Le chemin du fichier.
+
+    Returns:
+        mmap.mmap: La projection du fichier (bytes vide si le fichier est vide).
+    """
+    with open(path, "rb") as fp:
+        if os.fstat(fp.fileno()).st_size == 0:
+            # Un fichier vide ne peut pas être projeté
+            return b""
+        return mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+
+def image_buffer(image):
+    """
+    Renvoie le contenu d'une image sous forme de tampon partagé en lecture seule.
+
+    Les fichiers en mémoire (BytesIO, fichiers téléversés avec Streamlit) et
+    les contenus déjà chargés sont exposés sans copie, et les fichiers sur
+    disque sont projetés en mémoire avec mmap ; ce tampon unique sert
+    ensuite à l'empreinte, à la lecture EXIF, à l'aperçu et à la réécriture.
+
+    Args:
+        image: L'image (chemin, fichier binaire, bytes ou memoryview).
+
+    Returns:
+        memoryview: Le contenu de l'image, en lecture seule.
+    """
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return memoryview(image).toreadonly()
+    if isinstance(image, str):
+        return memoryview(map_image_file(image)).toreadonly()
+    if hasattr(image, "getvalue"):
+        # BytesIO renvoie son tampon interne sans le recopier
+        return memoryview(image.getvalue()).toreadonly()
+    start = image.tell()
+    try:
+        return memoryview(image.read()).toreadonly()
+    finally:
+        image.seek(start)
+
+def _read_tag_value(data, endian, tag_type, count, value_offset):
+    """
+    Décode la valeur d'une entrée d'IFD comme le fait PIL.
+
+    Args:
+        data (bytes): Le bloc TIFF complet.
+        endian (str): '<' ou '>' selon l'ordre des octets du bloc.
+        tag_type (int): Le type TIFF de l'entrée.
+        count (int): Le nombre d'éléments de la valeur.
+        value_offset (int): La position des données de la valeur dans le bloc.
+
+    Returns:
+        La valeur décodée (str, bytes, nombre, IFDRational ou tuple).
+    """
+    fmt, size = TIFF_TYPES[tag_type]
+    raw = data[value_offset:value_offset + size * count]
+    if len(raw) < size * count:
+        raise ValueError("Truncated EXIF value")
+    if tag_type == 2:
+        if raw.endswith(b"\x00"):
+            raw = raw[:-1]
+        return raw.decode("latin-1", "replace")
+    if tag_type in (1, 7):
+        return raw
+    if tag_type in (5, 10):
+        numbers = struct.unpack(f"{endian}{2 * count}{fmt}", raw)
+        values = tuple(IFDRational(numbers[i], numbers[i + 1])
+                       for i in range(0, len(numbers), 2))
+    else:
+        values = struct.unpack(f"{endian}{count}{fmt}", raw)
+    return values[0] if len(values) == 1 else values
+
+def _index_ifd(data, endian, offset):
+    """
+    Repère les entrées d'un IFD du bloc TIFF, sans décoder leurs valeurs.
+
+    Args:
+        data (bytes): Le bloc TIFF complet.
+        endian (str): '<' ou '>' selon l'ordre des octets du bloc.
+        offset (int): La position de l'IFD dans le bloc.
+
+    Returns:
+        dict: {identifiant de tag: (type TIFF, nombre d'éléments, position de
+              la valeur)} ; les entrées dont la valeur déborde du bloc sont ignorées.
+    """
+    entries = {}
+    if offset < 8 or offset + 2 > len(data):
+        return entries
+    (num_entries,) = struct.unpack_from(f"{endian}H", data, offset)
+    for i in range(num_entries):
+        entry = offset + 2 + 12 * i
+        if entry + 12 > len(data):
+            break
+        tag, tag_type, count = struct.unpack_from(f"{endian}HHL", data, entry)
+        if tag_type not in TIFF_TYPES:
+            continue
+        size = TIFF_TYPES[tag_type][1] * count
+        if size <= 4:
+            value_offset = entry + 8
+        else:
+            (value_offset,) = struct.unpack_from(f"{endian}L", data, entry + 8)
+        if value_offset + size > len(data):
+            continue
+        entries[tag] = (tag_type, count, value_offset)
+    return entries
+
+def _read_ifd(data, endian, offset):
+    """
+    Lit les entrées d'un IFD du bloc TIFF.
+
+    Args:
+        data (bytes): Le bloc TIFF complet.
+        endian (str): '<' ou '>' selon l'ordre des octets du bloc.
+        offset (int): La position de l'IFD dans le bloc.
+
+    Returns:
+        dict: Un dictionnaire {identifiant de tag: valeur}.
+    """
+    return {tag: _read_tag_value(data, endian, *entry)
+            for tag, entry in _index_ifd(data, endian, offset).items()}
+
+@functools.lru_cache(maxsize=None)
+def _tag_tables():
+    """
+    Construit, au premier appel, les index des noms de tags EXIF et GPS.
+
+    Returns:
+        tuple: ({nom: (IFD, identifiant, type TIFF)},
+                {'main' ou 'GPS': {identifiant: nom}}).
+    """
+    by_name = {}
+    by_id = {"main": {}, "GPS": {}}
+    for tag_id, name in ExifTags.TAGS.items():
+        if tag_id in EXIF_IFD_TYPES:
+            spec = ("Exif", tag_id, EXIF_IFD_TYPES[tag_id])
+        else:
+            spec = ("0th", tag_id, TiffTags.lookup(tag_id).type)
+        # En cas de doublon, le tag de l'IFD EXIF l'emporte
+        if name not in by_name or spec[0] == "Exif":
+            by_name[name] = spec
+        by_id["main"][tag_id] = name
+    for tag_id, name in ExifTags.GPSTAGS.items():
+        by_name[name] = ("GPS", tag_id, GPS_IFD_TYPES.get(tag_id))
+        by_id["GPS"][tag_id] = name
+    return by_name, by_id
+
+def lookup_tag(tag_name):
+    """
+    Renvoie l'emplacement d'un tag à partir de son nom.
+
+    Args:
+        tag_name (str): Le nom du tag, par exemple 'Make' ou 'GPSLatitude'.
+
+    Returns:
+        tuple: (IFD, identifiant, type TIFF ou None), ou None si le nom est inconnu.
+    """
+    return _tag_tables()[0].get(tag_name)
+
+def tag_name_of(ifd, tag_id):
+    """
+    Renvoie le nom d'un tag à partir de son IFD et de son identifiant.
+
+    Returns:
+        Le nom du tag, ou son identifiant s'il est inconnu.
+    """
+    table = "GPS" if ifd == "GPS" else "main"
+    return _tag_tables()[1][table].get(tag_id, tag_id)
+
+def _read_ifd_types(data, endian, offset):
+    """
+    Renvoie le type TIFF de chaque entrée d'un IFD.
+
+    Returns:
+        dict: Un dictionnaire {identifiant de tag: type TIFF}.
+    """
+    types = {}
+    if offset < 8 or offset + 2 > len(data):
+        return types
+    (num_entries,) = struct.unpack_from(f"{endian}H", data, offset)
+    for i in range(num_entries):
+        entry = offset + 2 + 12 * i
+        if entry + 12 > len(data):
+            break
+        tag, tag_type = struct.unpack_from(f"{endian}HH", data, entry)
+        if tag_type in TIFF_TYPES:
+            types[tag] = tag_type
+    return types
+
+def _tiff_endian(data):
+    """
+    Renvoie l'ordre des octets ('<' ou '>') d'un bloc TIFF.
+    """
+    if data[:4] == b"II*\x00":
+        return "<"
+    if data[:4] == b"MM\x00*":
+        return ">"
+    raise ValueError("Invalid TIFF header in EXIF segment")
+
+def read_ifd_offsets(data, ifds=None):
+    """
+    Localise l'IFD0 et les sous-IFD EXIF et GPS d'un bloc TIFF.
+
+    Args:
+        data (bytes): Le bloc TIFF extrait du segment APP1.
+        ifds: Les sous-IFD à localiser ('Exif', 'GPS') ; tous si absent.
+
+    Returns:
+        dict: {nom d'IFD ('0th', 'Exif', 'GPS'): position dans le bloc}.
+    """
+    endian = _tiff_endian(data)
+    if len(data) < 8:
+        raise ValueError("Truncated TIFF header in EXIF segment")
+    (ifd0_offset,) = struct.unpack_from(f"{endian}L", data, 4)
+    offsets = {"0th": ifd0_offset}
+    # Seuls les pointeurs vers les sous-IFD sont décodés
+    ifd0 = _index_ifd(data, endian, ifd0_offset)
+    for ifd, pointer in SUB_IFD_POINTERS.items():
+        if pointer in ifd0 and (ifds is None or ifd in ifds):
+            value = _read_tag_value(data, endian, *ifd0[pointer])
+            if isinstance(value, int):
+                offsets[ifd] = value
+    return offsets
+
+def requested_ifds(tags=None, ifds=None):
+    """
+    Détermine les IFD à parcourir pour lire un ensemble de tags.
+
+    Args:
+        tags: Les noms des tags demandés ; tous si absent.
+        ifds: Les IFD demandés explicitement ('0th', 'Exif', 'GPS').
+
+    Returns:
+        set: Les noms des IFD à parcourir, ou None pour tous. L'IFD0, qui
+             porte les pointeurs des sous-IFD, est toujours parcouru quand
+             les IFD sont déduits des tags.
+    """
+    if ifds is not None:
+        return set(ifds)
+    if tags is None:
+        return None
+    found = {"0th"}
+    for tag_name in tags:
+        spec = lookup_tag(tag_name)
+        if spec is not None:
+            found.add(spec[0])
+    return found
+
+class LazyExif(Mapping):
+    """
+    Vue en lecture seule des métadonnées EXIF d'un bloc TIFF, décodées à la demande.
+
+    Les entrées des IFD sont repérées à la construction, mais la valeur d'un
+    tag n'est décodée qu'à son premier accès, puis conservée : le formulaire
+    et la carte ne paient que pour les quelques tags qu'ils lisent, pas pour
+    MakerNote ou UserComment. Les tags GPS sont présentés à plat, sous leur nom.
+
+    Si des tags ou des IFD sont demandés, les sous-IFD qui ne les contiennent
+    pas ne sont pas parcourus et seuls les tags demandés sont indexés.
+    """
+
+    def __init__(self, block=None, tags=None, ifds=None):
+        self.block = block
+        self._index = {}
+        self._values = {}
+        self._endian = None
+        if block is not None:
+            wanted = None if tags is None else set(tags)
+            ifds = requested_ifds(tags, ifds)
+            self._endian = _tiff_endian(block)
+            for ifd, offset in read_ifd_offsets(block, ifds).items():
+                if ifds is not None and ifd not in ifds:
+                    # L'IFD0 n'a été lu que pour ses pointeurs
+                    continue
+                for tag, entry in _index_ifd(block, self._endian, offset).items():
+                    if ifd == "0th" and tag == GPS_IFD_POINTER:
+                        continue
+                    tag_name = tag_name_of(ifd, tag)
+                    if wanted is None or tag_name in wanted:
+                        self._index[tag_name] = entry
+
+    def __getitem__(self, tag_name):
+        try:
+            return self._values[tag_name]
+        except KeyError:
+            pass
+        value = _read_tag_value(self.block, self._endian, *self._index[tag_name])
+        self._values[tag_name] = value
+        return value
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __repr__(self):
+        return f"LazyExif({len(self)} tags, {len(self._values)} decoded)"
+
+    def value_size(self, tag_name):
+        """
+        Renvoie la taille en octets de la valeur d'un tag, sans la décoder.
+        """
+        tag_type, count, _ = self._index[tag_name]
+        return TIFF_TYPES[tag_type][1] * count
+
+    def preview(self, max_bytes=EXIF_PREVIEW_VALUE_BYTES):
+        """
+        Renvoie les tags sous forme de dictionnaire pour l'affichage.
+
+        Les valeurs plus grandes que max_bytes ne sont pas décodées : elles
+        sont remplacées par leur taille, par exemple '<20000 bytes>'.
+        """
+        return {tag_name: self[tag_name] if self.value_size(tag_name) <= max_bytes
+                else f"<{self.value_size(tag_name)} bytes>" for tag_name in self._index}
+
+def read_exif_data(image, tags=None, ifds=None):
+    """
+    Lit les métadonnées EXIF de l'image sans intercepter les erreurs.
+
+    Seul l'en-tête du JPEG est lu : les données de l'image ne sont jamais
+    décodées. Un chemin est projeté en mémoire avec mmap, si bien que seules
+    les pages des segments d'en-tête sont touchées. Les tags GPS sont
+    renvoyés à plat, sous leur nom (GPSLatitude...), et chaque valeur n'est
+    décodée qu'au moment où elle est lue.
+
+    Args:
+        image: L'image (chemin, fichier binaire ou tampon) dont les métadonnées EXIF doivent être extraites.
+        tags: Les noms des tags à extraire, par exemple {'DateTime', 'GPSLatitude'} ; tous si absent.
+        ifds: Les IFD à parcourir ('0th', 'Exif', 'GPS') ; déduits des tags si absent.
+
+    Returns:
+        LazyExif: Une vue {nom du tag: valeur} des métadonnées EXIF de l'image.
+    """
+    if isinstance(image, str):
+        mapped = map_image_file(image)
+        reader = BufferReader(mapped)
+        try:
+            block = read_exif_segment(reader)
+        finally:
+            reader.close()
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+    elif isinstance(image, (bytes, bytearray, memoryview)):
+        block = read_exif_segment(BufferReader(image))
+    else:
+        start = image.tell()
+        try:
+            block = read_exif_segment(image)
+        finally:
+            image.seek(start)
+    return LazyExif(block, tags, ifds)
+
+def get_exif_data(image, tags=None, ifds=None):
+    """
+    Extrait les métadonnées EXIF de l'image.
+
+    Args:
+        image: L'image (chemin, fichier binaire ou tampon) dont les métadonnées EXIF doivent être extraites.
+        tags: Les noms des tags à extraire ; tous si absent.
+        ifds: Les IFD à parcourir ('0th', 'Exif', 'GPS') ; déduits des tags si absent.
+
+    Returns:
+        LazyExif: Une vue {nom du tag: valeur} des métadonnées EXIF de l'image,
+                  vide en cas d'erreur.
+    """
+    try:
+        return read_exif_data(image, tags, ifds)
+    except Exception as e:
+        import streamlit as st
+        st.error(f"Error: {e}")
+    return LazyExif()
+
+def _parse_numbers(value, cast):
+    """
+    Convertit une valeur saisie (nombre, tuple ou texte) en liste de nombres.
+
+    Args:
+        value: La valeur à convertir, par exemple 3200, "1/250" ou "(48, 51, 30.2)".
+        cast: La fonction de conversion appliquée à chaque élément.
+
+    Returns:
+        list: Les nombres convertis.
+    """
+    if isinstance(value, (list, tuple)):
+        items = value
+    elif isinstance(value, str):
+        items = [item for item in value.strip("()[] ").split(",") if item.strip()]
+    else:
+        items = [value]
+    return [cast(item.strip() if isinstance(item, str) else item) for item in items]
+
+def _to_fraction(value):
+    """
+    Convertit un nombre, un IFDRational ou un texte ("1/250", "2.8") en Fraction.
+    """
+    if isinstance(value, IFDRational):
+        return Fraction(value.numerator, value.denominator)
+    return Fraction(value).limit_denominator(1000000)
+
+def to_float(value):
+    """
+    Convertit une valeur EXIF (rationnel, nombre, texte '1/250' ou tuple) en flottant.
+
+    Returns:
+        float: La valeur, NaN si elle est absente ou illisible.
+    """
+    if isinstance(value, (tuple, list)):
+        value = value[0] if value else None
+    if value is None or value == "":
+        return np.nan
+    try:
+        return float(_to_fraction(value.strip() if isinstance(value, str) else value))
+    except (ValueError, TypeError, ZeroDivisionError):
+        return np.nan
+
+def encode_tag_value(endian, tag_type, value):
+    """
+    Encode une valeur de tag au format TIFF.
+
+    Args:
+        endian (str): '<' ou '>' selon l'ordre des octets du bloc.
+        tag_type (int): Le type TIFF de la valeur.
+        value: La valeur à encoder.
+
+    Returns:
+        tuple: (nombre d'éléments, données encodées).
+    """
+    fmt = TIFF_TYPES[tag_type][0]
+    if tag_type == 2:
+        data = str(value).encode("latin-1") + b"\x00"
+        return len(data), data
+    if tag_type in (1, 7) and isinstance(value, (bytes, str)):
+        data = value if isinstance(value, bytes) else value.encode("latin-1")
+        return len(data), data
+    if tag_type in (5, 10):
+        fractions = _parse_numbers(value, _to_fraction)
+        numbers = []
+        for fraction in fractions:
+            numbers += [fraction.numerator, fraction.denominator]
+        return len(fractions), struct.pack(f"{endian}{len(numbers)}{fmt}", *numbers)
+    cast = float if tag_type in (11, 12) else (lambda item: int(float(item)))
+    numbers = _parse_numbers(value, cast)
+    return len(numbers), struct.pack(f"{endian}{len(numbers)}{fmt}", *numbers)
+
+def _append_aligned(out, data):
+    """
+    Ajoute des données à la fin du bloc TIFF sur une position paire.
+
+    Returns:
+        int: La position des données ajoutées.
+    """
+    if len(out) % 2:
+        out.append(0)
+    offset = len(out)
+    out += data
+    return offset
+
+def _rewrite_ifd(out, endian, offset, changes, limit=None):
+    """
+    Applique des modifications à un IFD du bloc TIFF sans déplacer le reste.
+
+    Les entrées existantes conservent leurs données (y compris les décalages
+    absolus, par exemple ceux d'un MakerNote). Une valeur modifiée est écrite
+    à la place de l'ancienne si elle y tient, sinon à la fin du bloc. Si de
+    nouveaux tags sont ajoutés, la table d'entrées est recopiée en fin de bloc.
+
+    Comme à la lecture (voir _index_ifd), un IFD situé hors du bloc est
+    considéré comme absent et seules les entrées contenues dans le bloc sont
+    conservées.
+
+    Args:
+        out (bytearray): Le bloc TIFF, modifié sur place.
+        endian (str): '<' ou '>' selon l'ordre des octets du bloc.
+        offset (int): La position de l'IFD, ou None pour créer un IFD vide.
+        changes (dict): {identifiant de tag: (type TIFF, valeur)}.
+        limit (int): La taille du bloc d'origine ; ce qui a déjà été ajouté
+            au-delà n'est jamais lu comme faisant partie de l'IFD.
+
+    Returns:
+        int: La position (éventuellement nouvelle) de l'IFD.
+    """
+    if limit is None:
+        limit = len(out)
+    entries = {}
+    next_ifd = b"\x00\x00\x00\x00"
+    if offset is not None and (offset < 8 or offset + 2 > limit):
+        offset = None
+    if offset is not None:
+        (num_entries,) = struct.unpack_from(f"{endian}H", out, offset)
+        num_entries = min(num_entries, (limit - offset - 2) // 12)
+        for i in range(num_entries):
+            entry = offset + 2 + 12 * i
+            tag, tag_type, count = struct.unpack_from(f"{endian}HHL", out, entry)
+            entries[tag] = (tag_type, count, bytes(out[entry + 8:entry + 12]))
+        table_end = offset + 2 + 12 * num_entries
+        next_ifd = bytes(out[table_end:min(table_end + 4, limit)]).ljust(4, b"\x00")
+
+    for tag, (tag_type, value) in changes.items():
+        count, data = encode_tag_value(endian, tag_type, value)
+        if len(data) <= 4:
+            field = data.ljust(4, b"\x00")
+        else:
+            old = entries.get(tag)
+            old_size = TIFF_TYPES[old[0]][1] * old[1] if old and old[0] in TIFF_TYPES else 0
+            value_offset = struct.unpack(f"{endian}L", old[2])[0] if old_size > 4 else 0
+            if old_size >= len(data) and 8 <= value_offset <= limit - len(data):
+                out[value_offset:value_offset + len(data)] = data
+            else:
+                value_offset = _append_aligned(out, data)
+            field = struct.pack(f"{endian}L", value_offset)
+        entries[tag] = (tag_type, count, field)
+
+    table = bytearray(struct.pack(f"{endian}H", len(entries)))
+    for tag in sorted(entries):
+        tag_type, count, field = entries[tag]
+        table += struct.pack(f"{endian}HHL", tag, tag_type, count) + field
+    table += next_ifd
+    if (offset is not None and len(table) == 2 + 12 * num_entries + 4
+            and offset + len(table) <= limit):
+        out[offset:offset + len(table)] = table
+        return offset
+    return _append_aligned(out, table)
+
+def build_exif_block(block, changes):
+    """
+    Produit un nouveau bloc TIFF EXIF à partir de l'ancien et des modifications.
+
+    Args:
+        block (bytes): Le bloc TIFF d'origine, ou None si l'image n'en a pas.
+        changes (dict): {nom d'IFD ('0th', 'Exif', 'GPS'): {identifiant de tag: (type TIFF, valeur)}}.
+
+    Returns:
+        bytes: Le nouveau bloc TIFF.
+    """
+    if block is None:
+        # En-tête TIFF little-endian suivi d'un IFD0 vide
+        block = b"II*\x00\x08\x00\x00\x00\x00\x00\x00\x00\x00\x00"
+    out = bytearray(block)
+    endian = _tiff_endian(block)
+    offsets = read_ifd_offsets(block)
+    ifd0_changes = dict(changes.get("0th", {}))
+    for ifd, pointer in SUB_IFD_POINTERS.items():
+        if changes.get(ifd):
+            offset = offsets.get(ifd)
+            new_offset = _rewrite_ifd(out, endian, offset, changes[ifd], len(block))
+            if new_offset != offset:
+                ifd0_changes[pointer] = (4, new_offset)
+    if ifd0_changes:
+        new_offset = _rewrite_ifd(out, endian, offsets["0th"], ifd0_changes, len(block))
+        struct.pack_into(f"{endian}L", out, 4, new_offset)
+    return bytes(out)
+
+def splice_exif_segment(data, block):
+    """
+    Remplace (ou insère) le segment APP1 EXIF d'un JPEG sans toucher au reste.
+
+    Les autres segments et les données compressées de l'image sont recopiés
+    octet pour octet, en une seule copie vers le fichier produit : l'image
+    n'est ni décodée ni ré-encodée.
+
+    Args:
+        data: Le fichier JPEG d'origine (bytes ou memoryview).
+        block (bytes): Le nouveau bloc TIFF EXIF.
+
+    Returns:
+        bytes: Le fichier JPEG avec les nouvelles métadonnées.
+    """
+    payload = EXIF_HEADER + block
+    if len(payload) > MAX_SEGMENT_SIZE:
+        raise ValueError("EXIF data too large for a JPEG APP1 segment")
+    segment = b"\xff" + bytes([JPEG_APP1]) + struct.pack(">H", len(payload) + 2) + payload
+    fp = BufferReader(data)
+    if data[:2] != JPEG_SOI:
+        raise ValueError("Not a JPEG file")
+    insert_at = replace_end = len(JPEG_SOI)
+    for marker, start, end in iter_jpeg_segments(fp):
+        if marker == JPEG_APP1 and fp.read(len(EXIF_HEADER)) == EXIF_HEADER:
+            insert_at, replace_end = start, end
+            break
+        if marker == 0xE0:
+            # Le segment EXIF se place après l'en-tête JFIF (APP0)
+            insert_at = replace_end = end
+    return b"".join((data[:insert_at], segment, data[replace_end:]))
+
+def _dms_triple(value):
+    """
+    Normalise une coordonnée GPS en triplet (degrés, minutes, secondes).
+
+    Args:
+        value: Un tuple de rationnels EXIF, un nombre décimal, ou leur forme texte.
+
+    Returns:
+        tuple: Trois flottants, NaN si la valeur est absente ou illisible.
+    """
+    if value is None or value == "":
+        return (np.nan, np.nan, np.nan)
+    try:
+        numbers = _parse_numbers(value, float)
+    except (ValueError, TypeError, ZeroDivisionError):
+        return (np.nan, np.nan, np.nan)
+    if len(numbers) == 1:
+        return (numbers[0], 0.0, 0.0)
+    if len(numbers) == 3:
+        return tuple(numbers)
+    return (np.nan, np.nan, np.nan)
+
+def dms_to_decimal(dms, refs=None):
+    """
+    Convertit des coordonnées en degrés, minutes, secondes en degrés décimaux.
+
+    Le calcul est vectorisé : toute une collection est convertie en un appel.
+
+    Args:
+        dms: Un tableau (N, 3) de degrés, minutes, secondes, ou (N, 3, 2)
+             de numérateurs et dénominateurs des rationnels EXIF. Le signe
+             des degrés s'applique à toute la coordonnée : (-33, 51, 24)
+             vaut -33.8567.
+        refs: Les références N/S/E/W de chaque coordonnée ; S et W donnent
+              une valeur négative.
+
+    Returns:
+        numpy.ndarray: Les N coordonnées décimales (NaN si inconnues).
+    """
+    dms = np.asarray(dms, dtype=float).reshape(-1, 3, *np.shape(dms)[2:])
+    if dms.ndim == 3:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            dms = dms[..., 0] / dms[..., 1]
+    decimal = np.copysign(np.abs(dms[:, 0]) + dms[:, 1] / 60.0 + dms[:, 2] / 3600.0, dms[:, 0])
+    if refs is not None:
+        refs = np.asarray(refs, dtype=str)
+        decimal = np.where(np.isin(refs, ("S", "W")), -decimal, decimal)
+    return decimal
+
+def decimal_to_dms(decimal):
+    """
+    Convertit des degrés décimaux en degrés, minutes, secondes (valeur absolue).
+
+    Args:
+        decimal: Un tableau de N coordonnées décimales.
+
+    Returns:
+        numpy.ndarray: Un tableau (N, 3) de degrés, minutes et secondes,
+                       les secondes arrondies au dix-millième.
+    """
+    magnitude = np.abs(np.asarray(decimal, dtype=float).reshape(-1))
+    degrees = np.floor(magnitude)
+    minutes = np.floor((magnitude - degrees) * 60.0)
+    seconds = np.round((magnitude - degrees - minutes / 60.0) * 3600.0, 4)
+    # Report des arrondis à 60 secondes ou 60 minutes
+    carry = seconds >= 60.0
+    seconds = np.where(carry, seconds - 60.0, seconds)
+    minutes = minutes + carry
+    carry = minutes >= 60.0
+    minutes = np.where(carry, minutes - 60.0, minutes)
+    degrees = degrees + carry
+    return np.stack([degrees, minutes, np.abs(seconds)], axis=1)
+
+def gps_rationals(decimal):
+    """
+    Convertit une coordonnée décimale en trois rationnels EXIF (valeur absolue).
+
+    Returns:
+        tuple: (degrés, minutes, secondes) sous forme de Fraction.
+    """
+    degrees, minutes, seconds = decimal_to_dms([decimal])[0]
+    return (Fraction(int(degrees)), Fraction(int(minutes)),
+            Fraction(int(round(seconds * 10000)), 10000))
+
+def gps_coordinates(exif_records):
+    """
+    Calcule la latitude et la longitude décimales d'une collection d'images.
+
+    Args:
+        exif_records: Une liste de dictionnaires EXIF (comme ceux de get_exif_data).
+
+    Returns:
+        tuple: Deux tableaux numpy (latitudes, longitudes), NaN si absentes.
+    """
+    lat = dms_to_decimal([_dms_triple(record.get("GPSLatitude")) for record in exif_records],
+                         [record.get("GPSLatitudeRef") or "N" for record in exif_records])
+    lon = dms_to_decimal([_dms_triple(record.get("GPSLongitude")) for record in exif_records],
+                         [record.get("GPSLongitudeRef") or "E" for record in exif_records])
+    return lat, lon
+
+def format_gps_magnitudes(values):
+    """
+    Formate des coordonnées décimales (valeur absolue) comme dans le formulaire.
+
+    Returns:
+        list: Les textes, vides pour les coordonnées inconnues.
+    """
+    values = np.asarray(values, dtype=float)
+    texts = np.char.mod("%.6f", np.abs(values))
+    return np.where(np.isnan(values), "", texts).tolist()
+
+def apply_gps_signs(updated_exif):
+    """
+    Reporte le signe d'une latitude ou longitude saisie sur sa référence.
+
+    Une valeur négative (décimale, ou en degrés, minutes, secondes avec des
+    degrés négatifs) devient sa valeur absolue avec la référence S ou W. Une
+    valeur positive sans référence indiquée reçoit N ou E, pour ne pas
+    hériter de la référence déjà enregistrée dans l'image.
+
+    Args:
+        updated_exif: Un dictionnaire avec les nouvelles valeurs EXIF.
+
+    Returns:
+        dict: Une copie où les coordonnées sont positives et les références indiquées.
+    """
+    result = dict(updated_exif)
+    for tag, ref_tag, positive_ref, negative_ref in (("GPSLatitude", "GPSLatitudeRef", "N", "S"),
+                                                     ("GPSLongitude", "GPSLongitudeRef", "E", "W")):
+        decimal = dms_to_decimal([_dms_triple(result.get(tag))])[0]
+        if np.isnan(decimal):
+            continue
+        if np.signbit(decimal):
+            result[tag] = str(-decimal)
+            result[ref_tag] = negative_ref
+        elif not result.get(ref_tag):
+            result[ref_tag] = positive_ref
+    return result
+
+def _normalize_value(tag_name, value):
+    """
+    Convertit une coordonnée GPS saisie en décimal en rationnels EXIF.
+    """
+    if tag_name in GPS_COORDINATE_TAGS:
+        try:
+            numbers = _parse_numbers(value, float)
+        except (ValueError, TypeError):
+            return value
+        if len(numbers) == 1:
+            return gps_rationals(numbers[0])
+    return value
+
+def _resolve_tag_type(spec, value):
+    """
+    Choisit le type TIFF d'un tag sans type connu d'après la valeur saisie.
+    """
+    if spec[2] is not None:
+        return spec[2]
+    if isinstance(value, bytes):
+        return 7
+    if isinstance(value, (IFDRational, Fraction, float)):
+        return 5
+    if isinstance(value, int):
+        return 4
+    return 2
+
+def validate_exif_data(updated_exif):
+    """
+    Vérifie que les nouvelles valeurs EXIF peuvent être écrites.
+
+    Args:
+        updated_exif: Un dictionnaire {nom de tag: valeur}.
+
+    Returns:
+        dict: {nom de tag: message d'erreur} pour chaque valeur refusée.
+    """
+    errors = {}
+    for tag_name, value in updated_exif.items():
+        if value is None or value == "":
+            continue
+        spec = lookup_tag(tag_name)
+        if spec is None:
+            errors[tag_name] = "Unknown EXIF tag"
+            continue
+        value = _normalize_value(tag_name, value)
+        try:
+            encode_tag_value("<", _resolve_tag_type(spec, value), value)
+        except (ValueError, TypeError, ZeroDivisionError, struct.error) as e:
+            errors[tag_name] = f"Invalid value {value!r}: {e}"
+    return errors
+
+def update_exif_data(image, updated_exif):
+    """
+    Met à jour les métadonnées EXIF de l'image avec les nouvelles valeurs.
+
+    Seul le segment EXIF est réécrit : les données de l'image sont recopiées
+    telles quelles, sans perte de qualité.
+
+    Args:
+        image: L'image (chemin, fichier binaire ou tampon) à mettre à jour.
+        updated_exif: Un dictionnaire avec les nouvelles valeurs EXIF.
+                      Les valeurs vides et les tags inconnus sont ignorés ;
+                      une coordonnée GPS peut être donnée en degrés décimaux,
+                      négatifs au sud et à l'ouest.
+
+    Returns:
+        bytes: Le fichier JPEG mis à jour avec les nouvelles métadonnées EXIF.
+    """
+    # Le signe d'une coordonnée décimale est porté par sa référence (S, W)
+    updated_exif = apply_gps_signs(updated_exif)
+    data = image_buffer(image)
+    block = read_exif_segment(BufferReader(data))
+    current = {}
+    if block is not None:
+        endian = _tiff_endian(block)
+        for ifd, offset in read_ifd_offsets(block).items():
+            current[ifd] = _read_ifd_types(block, endian, offset)
+    changes = {}
+    for tag_name, value in updated_exif.items():
+        if value is None or value == "":
+            continue
+        spec = lookup_tag(tag_name)
+        if spec is None:
+            continue
+        coordinate = GPS_REF_COORDINATES.get(tag_name)
+        if (coordinate is not None and updated_exif.get(coordinate) in (None, "")
+                and lookup_tag(coordinate)[1] not in current.get("GPS", {})):
+            # Une référence sans coordonnée n'est pas écrite (formulaire sans position GPS)
+            continue
+        value = _normalize_value(tag_name, value)
+        ifd, tag_id, tag_type = spec[0], spec[1], _resolve_tag_type(spec, value)
+        # Un tag déjà présent garde son IFD et son type
+        if ifd != "GPS":
+            for name in ("0th", "Exif"):
+                if tag_id in current.get(name, {}):
+                    ifd, tag_type = name, current[name][tag_id]
+        elif tag_id in current.get("GPS", {}):
+            tag_type = current["GPS"][tag_id]
+        changes.setdefault(ifd, {})[tag_id] = (tag_type, value)
+    return splice_exif_segment(data, build_exif_block(block, changes))
+
+def content_digest(image):
+    """
+    Calcule une empreinte rapide (BLAKE2b) du contenu d'une image.
+
+    Args:
+        image: L'image (chemin, fichier binaire ou tampon).
+
+    Returns:
+        str: L'empreinte hexadécimale du contenu.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(image_buffer(image))
+    return digest.hexdigest()
+
+def _estimate_size(value):
+    """
+    Estime grossièrement la mémoire occupée par des métadonnées EXIF.
+    """
+    if isinstance(value, LazyExif):
+        # Le bloc TIFF, plus au plus autant de valeurs décodées
+        return 64 + 2 * len(value.block or b"") + 64 * len(value)
+    if isinstance(value, dict):
+        return 64 + sum(_estimate_size(k) + _estimate_size(v) for k, v in value.items())
+    if isinstance(value, (tuple, list)):
+        return 56 + sum(_estimate_size(v) for v in value)
+    if isinstance(value, (bytes, str)):
+        return 49 + len(value)
+    return 32
+
+class LRUCache:
+    """
+    Cache LRU indexé par l'empreinte du contenu d'une image.
+
+    Le cache est borné par un budget en octets et partagé entre les threads
+    (les sessions Streamlit d'un même serveur). Il sert aux métadonnées EXIF
+    et aux aperçus.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Renvoie la valeur associée à une empreinte, ou None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        """
+        Ajoute une valeur au cache en évinçant les moins récentes si besoin.
+        """
+        size = _estimate_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    def stats(self):
+        """
+        Renvoie les compteurs du cache.
+
+        Returns:
+            dict: Nombre de succès, d'échecs, d'évictions, d'entrées et octets utilisés.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+def get_exif_cache():
+    """
+    Crée le cache des métadonnées EXIF partagé par l'application.
+    """
+    return LRUCache(EXIF_CACHE_MAX_BYTES)
+
+def get_preview_cache():
+    """
+    Crée le cache des aperçus partagé par l'application.
+    """
+    return LRUCache(PREVIEW_CACHE_MAX_BYTES)
+
+def get_exif_data_cached(image, cache, key=None, strict=False):
+    """
+    Extrait les métadonnées EXIF de l'image en passant par le cache.
+
+    Args:
+        image: L'image (chemin, fichier binaire ou tampon).
+        cache (LRUCache): Le cache à utiliser.
+        key (str): L'empreinte du contenu, si elle est déjà calculée.
+        strict (bool): Lever les erreurs de lecture au lieu de les afficher
+                       (hors du fil du script Streamlit).
+
+    Returns:
+        LazyExif: Une vue {nom du tag: valeur} des métadonnées EXIF de l'image.
+    """
+    if key is None:
+        key = content_digest(image)
+    exif_data = cache.get(key)
+    if exif_data is None:
+        exif_data = read_exif_data(image) if strict else get_exif_data(image)
+        # Un résultat vide n'est pas conservé, pour signaler à nouveau les erreurs
+        if exif_data:
+            cache.put(key, exif_data)
+    # La vue est en lecture seule : elle peut être partagée sans copie
+    return exif_data
+
+def read_exif_thumbnail(block):
+    """
+    Renvoie la miniature JPEG intégrée dans l'IFD1 d'un bloc TIFF EXIF.
+
+    Args:
+        block (bytes): Le bloc TIFF extrait du segment APP1.
+
+    Returns:
+        bytes: La miniature JPEG, ou None si le bloc n'en contient pas.
+    """
+    endian = _tiff_endian(block)
+    (ifd0_offset,) = struct.unpack_from(f"{endian}L", block, 4)
+    if ifd0_offset + 2 > len(block):
+        return None
+    (num_entries,) = struct.unpack_from(f"{endian}H", block, ifd0_offset)
+    next_pointer = ifd0_offset + 2 + 12 * num_entries
+    if next_pointer + 4 > len(block):
+        return None
+    (ifd1_offset,) = struct.unpack_from(f"{endian}L", block, next_pointer)
+    ifd1 = _read_ifd(block, endian, ifd1_offset)
+    offset, length = ifd1.get(THUMBNAIL_OFFSET), ifd1.get(THUMBNAIL_LENGTH)
+    if not isinstance(offset, int) or not isinstance(length, int):
+        return None
+    thumbnail = block[offset:offset + length]
+    if len(thumbnail) != length or not thumbnail.startswith(JPEG_SOI):
+        return None
+    return thumbnail
+
+def make_preview(image, max_size=PREVIEW_MAX_SIZE):
+    """
+    Produit un aperçu JPEG léger de l'image.
+
+    La miniature intégrée aux métadonnées EXIF est utilisée si elle existe ;
+    sinon l'image est décodée en mode brouillon (réduction pendant la
+    décompression DCT) puis réduite à max_size pixels au plus. Si l'en-tête
+    JPEG ne peut pas être parcouru (PNG renommé en .jpg, en-tête abîmé),
+    l'image est confiée telle quelle à Pillow.
+
+    Args:
+        image: L'image (chemin, fichier binaire ou tampon).
+        max_size (int): La plus grande dimension de l'aperçu décodé.
+
+    Returns:
+        bytes: L'aperçu au format JPEG.
+
+    Raises:
+        OSError: Si Pillow ne peut pas non plus décoder l'image.
+    """
+    data = image_buffer(image)
+    try:
+        block = read_exif_segment(BufferReader(data))
+    except (ValueError, struct.error):
+        block = None
+    if block is not None:
+        try:
+            thumbnail = read_exif_thumbnail(block)
+        except (ValueError, struct.error):
+            thumbnail = None
+        if thumbnail is not None:
+            return thumbnail
+    img = Image.open(BufferReader(data))
+    img.draft("RGB", (max_size, max_size))
+    img = img.convert("RGB")
+    img.thumbnail((max_size, max_size))
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=85)
+    return buf.getvalue()
+
+def get_preview_cached(image, cache, key=None):
+    """
+    Produit l'aperçu de l'image en passant par le cache.
+
+    Args:
+        image: L'image (chemin, fichier binaire ou tampon).
+        cache (LRUCache): Le cache à utiliser.
+        key (str): L'empreinte du contenu, si elle est déjà calculée.
+
+    Returns:
+        bytes: L'aperçu au format JPEG.
+    """
+    if key is None:
+        key = content_digest(image)
+    preview = cache.get(key)
+    if preview is None:
+        preview = make_preview(image)
+        cache.put(key, preview)
+    return preview
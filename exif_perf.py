@@ -0,0 +1,167 @@
+"""
+Instrumentation de l'application : étapes mesurées, totaux et export Prometheus.
+"""
+import contextlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+# Instrumentation optionnelle de l'application : activée par défaut si
+# EXIF_PERF vaut 1, totaux exportés au format Prometheus si un fichier est indiqué
+PERF_ENABLED = os.environ.get("EXIF_PERF", "") not in ("", "0")
+PERF_PROMETHEUS_FILE = os.environ.get("EXIF_PERF_PROMETHEUS_FILE")
+PERF_PROMETHEUS_METRICS = [
+    ("exif_app_stage_calls_total", "calls", "Number of times each stage ran."),
+    ("exif_app_stage_seconds_total", "seconds", "Time spent in each stage, in seconds."),
+    ("exif_app_stage_bytes_total", "bytes", "Bytes processed by each stage."),
+]
+perf_logger = logging.getLogger("exo4.perf")
+
+class PerfMetrics:
+    """
+    Totaux des mesures de performance depuis le démarrage du processus.
+
+    Partagés entre les sessions, ils sont exportés au format texte de
+    Prometheus (compteurs par étape : appels, secondes, octets).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = {}
+
+    def observe(self, stage, seconds, nbytes=None):
+        with self._lock:
+            totals = self._totals.setdefault(stage, {"calls": 0, "seconds": 0.0, "bytes": 0})
+            totals["calls"] += 1
+            totals["seconds"] += seconds
+            totals["bytes"] += nbytes or 0
+
+    def snapshot(self):
+        """
+        Renvoie une copie des totaux : {étape: {calls, seconds, bytes}}.
+        """
+        with self._lock:
+            return {stage: dict(totals) for stage, totals in self._totals.items()}
+
+    def prometheus_text(self):
+        """
+        Met les totaux au format d'exposition texte de Prometheus.
+        """
+        snapshot = self.snapshot()
+        lines = []
+        for metric, field, help_text in PERF_PROMETHEUS_METRICS:
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} counter")
+            for stage in sorted(snapshot):
+                lines.append(f'{metric}{{stage="{stage}"}} {snapshot[stage][field]}')
+        return "\n".join(lines) + "\n"
+
+def get_perf_metrics():
+    """
+    Crée les totaux des mesures de performance partagés par l'application.
+    """
+    return PerfMetrics()
+
+class PerfRecorder:
+    """
+    Chronomètres et compteurs d'octets des étapes d'une exécution du script.
+
+    Désactivé, l'enregistreur ne mesure rien : les blocs instrumentés
+    s'exécutent sans surcoût notable. Activé, chaque étape est conservée pour
+    le panneau « Performance », ajoutée aux totaux et journalisée en JSON.
+    """
+
+    def __init__(self, enabled=False, metrics=None, deferred=False):
+        self.enabled = enabled
+        self.metrics = metrics
+        self.deferred = deferred
+        self.stages = []
+
+    def deferred_recorder(self):
+        """
+        Crée l'enregistreur d'une tâche d'arrière-plan.
+
+        Ses étapes ne sont ni comptées ni journalisées : elles le sont par
+        collect(), dans l'exécution du script qui attend la tâche, quelle que
+        soit celle qui l'a lancée.
+        """
+        return PerfRecorder(self.enabled, deferred=True)
+
+    def collect(self, other):
+        """
+        Reprend une seule fois les étapes mesurées par un enregistreur différé.
+        """
+        stages, other.stages = other.stages, []
+        for entry in stages:
+            self.record(entry["stage"], entry["ms"] / 1000, entry["bytes"])
+
+    @contextlib.contextmanager
+    def stage(self, name, nbytes=None):
+        """
+        Mesure la durée d'un bloc.
+
+        Le dictionnaire produit permet de renseigner la taille des données
+        traitées une fois connue : entry["bytes"] = len(data).
+
+        Args:
+            name (str): Le nom de l'étape.
+            nbytes (int): La taille des données traitées, si elle est déjà connue.
+        """
+        entry = {"bytes": nbytes}
+        if not self.enabled:
+            yield entry
+            return
+        start = time.perf_counter()
+        try:
+            yield entry
+        finally:
+            self.record(name, time.perf_counter() - start, entry["bytes"])
+
+    def record(self, name, seconds, nbytes=None):
+        """
+        Enregistre une étape mesurée.
+        """
+        if not self.enabled:
+            return
+        self.stages.append({"stage": name, "ms": round(seconds * 1000, 3), "bytes": nbytes})
+        if self.deferred:
+            return
+        if self.metrics is not None:
+            self.metrics.observe(name, seconds, nbytes)
+        perf_logger.info(json.dumps({"time": round(time.time(), 3), "event": "stage", "stage": name,
+                                     "seconds": round(seconds, 6), "bytes": nbytes}))
+
+def configure_perf_logging():
+    """
+    Envoie les mesures journalisées sur la sortie d'erreur, une ligne JSON par étape.
+    """
+    if not perf_logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        perf_logger.addHandler(handler)
+        perf_logger.setLevel(logging.INFO)
+        perf_logger.propagate = False
+
+def write_prometheus_file(metrics, path):
+    """
+    Écrit les totaux dans un fichier lu par le collecteur textfile de node_exporter.
+
+    Le fichier est remplacé en une fois, pour ne jamais être lu à moitié écrit.
+    Chaque écriture passe par son propre fichier temporaire : deux sessions qui
+    écrivent en même temps ne se gênent pas, la dernière remplace l'autre.
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    fp = tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=directory, prefix=f".{name}.",
+                                     suffix=".tmp", delete=False)
+    try:
+        with fp:
+            fp.write(metrics.prometheus_text())
+        # Lisible par node_exporter, qui tourne souvent sous un autre utilisateur
+        os.chmod(fp.name, 0o644)
+        os.replace(fp.name, path)
+    except BaseException:
+        os.unlink(fp.name)
+        raise
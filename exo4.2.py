@@ -1,160 +1,553 @@
-import streamlit as st
-from PIL import Image, ExifTags
-import io
-import folium
-from streamlit_folium import folium_static
+import concurrent.futures
+import os
+import sqlite3
+import sys
+import threading
+import time
 
-def get_exif_data(image):
+import numpy as np
+
+from exif_io import (
+    LazyExif, apply_gps_signs, content_digest, format_gps_magnitudes, get_exif_cache,
+    get_exif_data_cached, get_preview_cache, get_preview_cached, gps_coordinates, image_buffer,
+    update_exif_data, validate_exif_data,
+)
+from poi_maps import (
+    MAP_HEIGHT, MAP_WIDTH, NEARBY_RADIUS_KM, NEAREST_POI_COUNT, POIS, build_poi_map, display_map,
+    get_map_cache, map_key, poi_index_for, render_map_cached,
+)
+from exif_batch import bulk_update_exif
+from exif_catalog import (
+    EXIF_CATALOG_PATH, EXIF_TABLE_AGGREGATES, EXIF_TABLE_NUMBER_COLUMNS, EXIF_TABLE_TEXT_COLUMNS,
+    ExifCatalog, ExifTable,
+)
+from exif_perf import (
+    PERF_ENABLED, PERF_PROMETHEUS_FILE, PerfRecorder, configure_perf_logging, get_perf_metrics,
+    write_prometheus_file,
+)
+from exif_cli import cli_main
+
+# Étapes lourdes de l'application (lecture EXIF, réécriture du JPEG, cartes)
+# exécutées hors du fil du script Streamlit, pour que la page reste réactive
+BACKGROUND_WORKERS = int(os.environ.get("EXIF_BACKGROUND_WORKERS", 4))
+BACKGROUND_POLL_SECONDS = 0.1
+
+def show_map_html(html):
+    """
+    Affiche le HTML d'une carte dans la page, comme folium_static.
+    """
+    import streamlit.components.v1 as components
+    components.html(html, height=MAP_HEIGHT + 10, width=MAP_WIDTH)
+
+def performance_panel(perf, caches):
+    """
+    Affiche le panneau « Performance » : étapes de l'exécution, totaux et caches.
+
+    Args:
+        perf (PerfRecorder): Les mesures de l'exécution en cours.
+        caches (dict): Les caches de l'application, par nom.
+    """
+    import streamlit as st
+
+    with st.expander("Performance"):
+        st.write("This run:")
+        st.table(perf.stages or [{"stage": "(nothing measured)", "ms": 0, "bytes": None}])
+        st.write(f"Total: {sum(entry['ms'] for entry in perf.stages):.1f} ms")
+        if perf.metrics is not None:
+            st.write("Since startup:")
+            st.table([{"stage": stage, **totals}
+                      for stage, totals in sorted(perf.metrics.snapshot().items())])
+            st.download_button("Download Prometheus metrics", perf.metrics.prometheus_text(),
+                               file_name="exif_metrics.prom", mime="text/plain")
+        st.write("Caches:")
+        st.table([{"cache": name, **cache.stats()} for name, cache in caches.items()])
+
+def get_background_executor():
+    """
+    Crée le pool de threads des étapes lourdes, partagé par l'application.
+
+    Des threads plutôt que des processus : le tampon de l'image et les caches
+    sont partagés sans copie, et Pillow comme zlib relâchent le GIL pendant
+    le décodage et l'encodage.
+    """
+    return concurrent.futures.ThreadPoolExecutor(max_workers=BACKGROUND_WORKERS,
+                                                 thread_name_prefix="exif-background")
+
+class BackgroundTasks:
+    """
+    Tâches d'arrière-plan d'une session, au plus une par emplacement.
+
+    Chaque tâche est identifiée par une clé (empreinte du fichier, valeurs
+    soumises...) : la même clé renvoie la tâche en cours, une autre clé annule
+    la précédente, devenue obsolète. Une tâche pas encore démarrée n'est
+    jamais exécutée ; une tâche démarrée peut recevoir un événement qu'elle
+    consulte entre ses étapes (voir raise_if_cancelled).
+    """
+
+    def __init__(self, executor):
+        self.executor = executor
+        self._tasks = {}
+
+    def submit(self, slot, key, func, *args, cancellable=False, perf=None):
+        """
+        Lance une tâche, ou renvoie celle qui a déjà été lancée avec la même clé.
+
+        Args:
+            slot (str): L'emplacement de la tâche, par exemple "read_exif".
+            key: La clé des données traitées.
+            func: La fonction à exécuter.
+            *args: Ses arguments.
+            cancellable (bool): Passer à la fonction l'événement d'annulation (cancelled=...).
+            perf (PerfRecorder): Passer à la fonction un enregistreur différé (perf=...),
+                                 repris par wait().
+
+        Returns:
+            concurrent.futures.Future: Le résultat à venir de la tâche.
+        """
+        current = self._tasks.get(slot)
+        # Une tâche échouée ou annulée est relancée plutôt que réutilisée
+        if current is not None and current[0] == key and not (
+                current[1].done() and (current[1].cancelled() or current[1].exception() is not None)):
+            return current[1]
+        self.cancel(slot)
+        cancelled = threading.Event()
+        kwargs = {"cancelled": cancelled} if cancellable else {}
+        task_perf = None
+        if perf is not None:
+            task_perf = kwargs["perf"] = perf.deferred_recorder()
+        future = self.executor.submit(func, *args, **kwargs)
+        self._tasks[slot] = (key, future, cancelled, task_perf)
+        return future
+
+    def __contains__(self, slot):
+        return slot in self._tasks
+
+    def wait(self, slot, placeholder, message, perf=None):
+        """
+        Attend la tâche d'un emplacement en affichant sa progression (voir wait_for_task).
+
+        Les étapes mesurées par la tâche sont reportées dans perf, l'enregistreur
+        de l'exécution en cours, même si la tâche a été lancée par une exécution
+        précédente, et une seule fois.
+        """
+        _, future, _, task_perf = self._tasks[slot]
+        try:
+            return wait_for_task(future, placeholder, message)
+        finally:
+            if perf is not None and task_perf is not None and future.done():
+                perf.collect(task_perf)
+
+    def cancel(self, *slots):
+        """
+        Annule les tâches des emplacements indiqués, ou toutes si aucun ne l'est.
+        """
+        for slot in slots or list(self._tasks):
+            current = self._tasks.pop(slot, None)
+            if current is not None:
+                current[2].set()
+                current[1].cancel()
+
+def raise_if_cancelled(cancelled):
+    """
+    Interrompt une tâche d'arrière-plan devenue obsolète.
+    """
+    if cancelled is not None and cancelled.is_set():
+        raise concurrent.futures.CancelledError()
+
+def wait_for_task(future, placeholder, message):
     """
-    Extrait les métadonnées EXIF de l'image.
+    Attend le résultat d'une tâche en affichant sa progression.
+
+    L'attente se fait par pas de BACKGROUND_POLL_SECONDS : chaque mise à jour
+    de l'emplacement rend la main à Streamlit, qui interrompt le script dès
+    que l'utilisateur agit (nouveau fichier, nouvelle soumission) au lieu
+    d'attendre la fin du calcul.
 
     Args:
-        image: L'image dont les métadonnées EXIF doivent être extraites.
+        future (concurrent.futures.Future): La tâche.
+        placeholder: L'emplacement de la page (st.empty()) où afficher la progression.
+        message (str): Le nom de l'étape, par exemple "Reading EXIF data".
 
     Returns:
-        dict: Un dictionnaire contenant les métadonnées EXIF de l'image.
+        Le résultat de la tâche ; ses erreurs sont levées.
     """
-    exif_data = {}
-    try:
-        img = Image.open(image)
-        exif = img._getexif()
-        if exif is not None:
-            for tag, value in exif.items():
-                tag_name = ExifTags.TAGS.get(tag, tag)
-                exif_data[tag_name] = value
-    except Exception as e:
-        st.error(f"Error: {e}")
+    start = time.perf_counter()
+    while not future.done():
+        placeholder.info(f"{message}... ({time.perf_counter() - start:.1f} s)")
+        concurrent.futures.wait([future], timeout=BACKGROUND_POLL_SECONDS)
+    placeholder.empty()
+    return future.result()
+
+def preview_task(upload, upload_key, preview_cache, perf):
+    """
+    Produit l'aperçu de l'image téléchargée, en arrière-plan.
+    """
+    with perf.stage("preview", upload.nbytes):
+        return get_preview_cached(upload, preview_cache, upload_key)
+
+def read_exif_task(upload, upload_key, exif_cache, perf):
+    """
+    Lit les métadonnées EXIF de l'image téléchargée, en arrière-plan.
+
+    Les erreurs sont levées, pour être affichées par le script.
+    """
+    with perf.stage("read_exif") as entry:
+        exif_data = get_exif_data_cached(upload, exif_cache, upload_key, strict=True)
+        entry["bytes"] = len(exif_data.block or b"")
     return exif_data
 
-def update_exif_data(image, updated_exif):
+def write_exif_task(upload, updated_exif, preview_cache, perf, cancelled=None):
     """
-    Met à jour les métadonnées EXIF de l'image avec les nouvelles valeurs.
+    Réécrit les métadonnées EXIF de l'image puis produit son aperçu, en arrière-plan.
 
-    Args:
-        image: L'image à mettre à jour.
-        updated_exif: Un dictionnaire avec les nouvelles valeurs EXIF.
+    Returns:
+        tuple: L'image mise à jour (bytes) et son aperçu JPEG.
+    """
+    with perf.stage("write_exif") as entry:
+        updated_image = update_exif_data(upload, updated_exif)
+        entry["bytes"] = len(updated_image)
+    raise_if_cancelled(cancelled)
+    with perf.stage("preview_updated", len(updated_image)):
+        preview = get_preview_cached(updated_image, preview_cache)
+    return updated_image, preview
+
+def location_map_task(lat, lon, poi_index, map_cache, perf, cancelled=None):
+    """
+    Cherche les POI proches d'une position puis produit sa carte, en arrière-plan.
+
+    Returns:
+        tuple: Le HTML de la carte, puis les positions et distances (km) des
+               POI les plus proches (voir PoiIndex.nearest).
+    """
+    with perf.stage("poi_search"):
+        nearby = [poi for poi, _ in poi_index.within_radius(lat, lon, NEARBY_RADIUS_KM)]
+        positions, distances = poi_index.nearest([lat], [lon], k=NEAREST_POI_COUNT)
+    raise_if_cancelled(cancelled)
+    marker = [{'name': 'Current Location', 'lat': lat, 'lon': lon}]
+    with perf.stage("map_html") as entry:
+        html = render_map_cached(map_key((lat, lon), 12, marker + nearby),
+                                 lambda: display_map(lat, lon, nearby), map_cache)
+        entry["bytes"] = len(html)
+    return html, positions, distances
+
+def bulk_edit_task(images, updated_exif, perf, cancelled=None):
+    """
+    Applique une même modification EXIF à plusieurs images, en arrière-plan.
+
+    Les images sont réparties entre BACKGROUND_WORKERS threads ; l'annulation
+    est vérifiée avant chaque image.
 
     Returns:
-        Image: L'image mise à jour avec les nouvelles métadonnées EXIF.
+        tuple: Le ZIP des images mises à jour (bytes) et le rapport (voir bulk_update_exif).
+    """
+    def pending():
+        for image in images:
+            raise_if_cancelled(cancelled)
+            yield image
+
+    with perf.stage("bulk_edit", sum(len(data) for _, data in images)) as entry:
+        archive, report = bulk_update_exif(pending(), updated_exif, workers=BACKGROUND_WORKERS)
+        entry["bytes"] = len(archive)
+    return archive, report
+
+def poi_map_task(key, map_cache, perf):
+    """
+    Produit la carte de tous les points d'intérêt, en arrière-plan.
     """
-    img = Image.open(image)
-    exif = img._getexif()
-    if exif is not None:
-        for tag_name, value in updated_exif.items():
-            tag_id = [k for k, v in ExifTags.TAGS.items() if v == tag_name]
-            if tag_id:
-                tag_id = tag_id[0]
-                exif[int(tag_id)] = value
-    img.info['exif'] = exif
-    return img
+    with perf.stage("map_html") as entry:
+        html = render_map_cached(key, lambda: build_poi_map(POIS), map_cache)
+        entry["bytes"] = len(html)
+    return html
 
-def display_map(lat, lon):
+def edit_exif_fields(exif_data, key_prefix="", blank_refs=False):
     """
-    Crée une carte centrée sur les coordonnées fournies et ajoute un marqueur.
+    Affiche les champs du formulaire d'édition EXIF.
 
     Args:
-        lat (float): Latitude pour centrer la carte.
-        lon (float): Longitude pour centrer la carte.
+        exif_data (dict): Les valeurs initiales des champs.
+        key_prefix (str): Préfixe des clés des widgets, pour afficher plusieurs formulaires.
+        blank_refs (bool): Proposer un choix vide pour les références GPS (laisser inchangé).
 
     Returns:
-        folium.Map: Un objet carte Folium avec un marqueur à la position spécifiée.
+        dict: Les valeurs saisies, indexées par nom de tag.
     """
-    m = folium.Map(location=[lat, lon], zoom_start=12)
-    folium.Marker([lat, lon], popup='Current Location').add_to(m)
-    return m
+    import streamlit as st
 
-def add_pois(map_obj, pois):
+    # Les coordonnées sont affichées en degrés décimaux
+    gps_text = [format_gps_magnitudes(values)[0] for values in gps_coordinates([exif_data])]
+    lat_refs = ["", "N", "S"] if blank_refs else ["N", "S"]
+    lon_refs = ["", "E", "W"] if blank_refs else ["E", "W"]
+    return {
+        "DateTime": st.text_input("DateTime", value=exif_data.get("DateTime", ""), key=key_prefix + "DateTime"),
+        "Make": st.text_input("Make (Camera Manufacturer)", value=exif_data.get("Make", ""), key=key_prefix + "Make"),
+        "Model": st.text_input("Model (Camera Model)", value=exif_data.get("Model", ""), key=key_prefix + "Model"),
+        "ExposureTime": st.text_input("Exposure Time", value=exif_data.get("ExposureTime", ""), key=key_prefix + "ExposureTime"),
+        "FNumber": st.text_input("F Number", value=exif_data.get("FNumber", ""), key=key_prefix + "FNumber"),
+        "ISOSpeedRatings": st.text_input("ISO", value=exif_data.get("ISOSpeedRatings", ""), key=key_prefix + "ISOSpeedRatings"),
+        "GPSLatitude": st.text_input("GPS Latitude", value=gps_text[0], key=key_prefix + "GPSLatitude"),
+        "GPSLongitude": st.text_input("GPS Longitude", value=gps_text[1], key=key_prefix + "GPSLongitude"),
+        "GPSLatitudeRef": st.selectbox("GPS Latitude Ref", lat_refs, index=lat_refs.index(exif_data.get("GPSLatitudeRef", lat_refs[0])), key=key_prefix + "GPSLatitudeRef"),
+        "GPSLongitudeRef": st.selectbox("GPS Longitude Ref", lon_refs, index=lon_refs.index(exif_data.get("GPSLongitudeRef", lon_refs[0])), key=key_prefix + "GPSLongitudeRef"),
+    }
+
+def bulk_edit_section(tasks, perf):
     """
-    Ajoute des points d'intérêt (POI) sur la carte.
+    Affiche le mode multi-fichiers : une même modification appliquée à plusieurs images.
 
     Args:
-        map_obj (folium.Map): La carte Folium sur laquelle ajouter les POI.
-        pois (list): Une liste de dictionnaires contenant les informations des POI.
-                     Chaque dictionnaire doit avoir les clés 'name', 'lat' et 'lon'.
+        tasks (BackgroundTasks): Les tâches d'arrière-plan de la session.
+        perf (PerfRecorder): L'enregistreur de l'exécution en cours.
+    """
+    import streamlit as st
+
+    st.subheader("Bulk Edit")
+    uploaded_files = st.file_uploader("Choose images...", type="jpg", accept_multiple_files=True)
+    # Le ZIP d'une sélection précédente n'est plus proposé, ni conservé
+    selection = tuple(f.id for f in uploaded_files or ())
+    if st.session_state.get("bulk_selection") != selection:
+        tasks.cancel("bulk_edit")
+        st.session_state["bulk_selection"] = selection
+    if not uploaded_files:
+        return
+    with st.form(key='bulk_edit_exif'):
+        st.caption("Empty fields are left unchanged.")
+        updated_exif = edit_exif_fields({}, key_prefix="bulk_", blank_refs=True)
+        if st.form_submit_button(f"Update {len(uploaded_files)} images"):
+            updated_exif = apply_gps_signs(updated_exif)
+            errors = validate_exif_data(updated_exif)
+            for tag_name, message in errors.items():
+                st.error(f"{tag_name}: {message}")
+            if errors:
+                tasks.cancel("bulk_edit")
+            else:
+                images = [(f.name, image_buffer(f)) for f in uploaded_files]
+                tasks.submit("bulk_edit", (selection, tuple(updated_exif.items())), bulk_edit_task,
+                             images, updated_exif, cancellable=True, perf=perf)
+    # Le ZIP est produit une seule fois : les réexécutions suivantes reprennent
+    # le résultat de la tâche, et le bouton de téléchargement ne peut pas être
+    # dans le formulaire
+    if "bulk_edit" not in tasks:
+        return
+    archive, report = tasks.wait("bulk_edit", st.empty(),
+                                 f"Updating {len(uploaded_files)} images", perf)
+    failed = sum(1 for entry in report if entry["status"] == "error")
+    st.table(report)
+    if failed:
+        st.warning(f"{failed} of {len(report)} images could not be updated")
+    else:
+        st.success(f"{len(report)} images updated successfully")
+    st.download_button("Download updated images (ZIP)", archive,
+                       file_name="updated_images.zip", mime="application/zip")
+
+def load_exif_table(db_path, mtime):
+    """
+    Charge la table de requêtes depuis un catalogue SQLite, ouvert en lecture seule.
+
+    La date de modification du fichier ne sert qu'à invalider le cache
+    Streamlit quand le catalogue change.
+    """
+    with ExifCatalog(db_path, read_only=True) as catalog:
+        return ExifTable.from_catalog(catalog)
+
+def exif_query_section():
     """
-    for poi in pois:
-        folium.Marker([poi['lat'], poi['lon']], popup=poi['name']).add_to(map_obj)
+    Affiche le panneau de requêtes sur les métadonnées du catalogue EXIF.
+    """
+    import streamlit as st
+
+    st.subheader("Query EXIF Catalog")
+    # Le catalogue est choisi par la configuration du serveur, pas par les visiteurs
+    db_path = EXIF_CATALOG_PATH
+    if not os.path.exists(db_path):
+        st.caption("No catalog yet: run 'python exo4.2.py catalog --scan <folder>' first.")
+        return
+    try:
+        table = st.experimental_memo(load_exif_table)(db_path, os.path.getmtime(db_path))
+    except sqlite3.DatabaseError as e:
+        st.error(f"Cannot read the EXIF catalog {db_path}: {e}")
+        return
+    st.caption(f"Catalog: {db_path}")
+    conditions = []
+    models = sorted(set(table.columns["Model"]) - {""})
+    selected_models = st.multiselect("Model", models)
+    if selected_models:
+        conditions.append(("Model", "in", selected_models))
+    min_iso = st.number_input("Minimum ISO", min_value=0, value=0, step=100)
+    if min_iso:
+        conditions.append(("ISOSpeedRatings", ">=", min_iso))
+    dates = st.date_input("Date range", value=())
+    if len(dates) == 2:
+        conditions.append(("DateTime", "between", (str(dates[0]), f"{dates[1]} 23:59:59")))
+    result = table.filter(conditions)
+    st.write(f"{len(result)} of {len(table)} photos")
+    group_column = st.selectbox("Group by", ["(none)"] + EXIF_TABLE_TEXT_COLUMNS)
+    if group_column == "(none)":
+        st.dataframe(result.to_rows(limit=1000))
+    else:
+        func = st.selectbox("Aggregate", EXIF_TABLE_AGGREGATES)
+        column = None
+        if func != "count":
+            column = st.selectbox("Column", EXIF_TABLE_NUMBER_COLUMNS)
+        st.table([{group_column: group, func: value}
+                  for group, value in result.group_by(group_column, column, func)])
 
 def main():
     """
     Fonction principale pour exécuter l'application Streamlit.
     """
+    import streamlit as st
+
     st.title("EXIF Metadata Editor")
+    perf_enabled = st.sidebar.checkbox("Performance instrumentation", value=PERF_ENABLED)
+    perf_metrics = st.experimental_singleton(get_perf_metrics)()
+    perf = PerfRecorder(perf_enabled, perf_metrics)
+    if perf.enabled:
+        configure_perf_logging()
+    caches = {}
+    # Tâches d'arrière-plan de la session, conservées d'une exécution du script à l'autre
+    if "background_tasks" not in st.session_state:
+        executor = st.experimental_singleton(get_background_executor)()
+        st.session_state["background_tasks"] = BackgroundTasks(executor)
+    tasks = st.session_state["background_tasks"]
 
     # Upload image
     uploaded_file = st.file_uploader("Choose an image...", type="jpg")
     if uploaded_file is not None:
-        # Affichage de l'image téléchargée
-        st.image(uploaded_file, caption='Uploaded Image', use_column_width=True)
+        # Les caches survivent aux réexécutions du script et sont partagés entre sessions
+        exif_cache = st.experimental_singleton(get_exif_cache)()
+        preview_cache = st.experimental_singleton(get_preview_cache)()
+        map_cache = st.experimental_singleton(get_map_cache)()
+        poi_index = poi_index_for()
+        caches = {"exif": exif_cache, "preview": preview_cache, "map": map_cache}
+        # Un seul tampon en lecture seule, partagé par toutes les étapes, sans copie
+        upload = image_buffer(uploaded_file)
+        with perf.stage("digest", upload.nbytes):
+            upload_key = content_digest(upload)
+
+        # Aperçu et métadonnées sont produits en parallèle, hors du fil du script ;
+        # un nouveau fichier annule les tâches lancées pour le précédent
+        tasks.submit("preview", upload_key, preview_task, upload, upload_key, preview_cache,
+                     perf=perf)
+        tasks.submit("read_exif", upload_key, read_exif_task, upload, upload_key, exif_cache,
+                     perf=perf)
+        poi_map_key = map_key((POIS[0]['lat'], POIS[0]['lon']), 2, POIS)
+        tasks.submit("poi_map", poi_map_key, poi_map_task, poi_map_key, map_cache, perf=perf)
+
+        # Affichage d'un aperçu de l'image téléchargée
+        try:
+            preview = tasks.wait("preview", st.empty(), "Preparing the preview", perf)
+        except (OSError, ValueError) as e:
+            # Image illisible : les métadonnées restent consultables
+            st.warning(f"Unable to display a preview of this image: {e}")
+        else:
+            with perf.stage("send_image", len(preview)):
+                st.image(preview, caption='Uploaded Image', use_column_width=True)
         
         # Lire les métadonnées EXIF de l'image
-        exif_data = get_exif_data(uploaded_file)
-        st.write("Current EXIF Data:", exif_data)
+        try:
+            exif_data = tasks.wait("read_exif", st.empty(), "Reading EXIF data", perf)
+        except Exception as e:
+            st.error(f"Error: {e}")
+            exif_data = LazyExif()
+        st.write("Current EXIF Data:", exif_data.preview())
         
         # Formulaire pour modifier les données EXIF
         st.subheader("Edit EXIF Data")
         
         with st.form(key='edit_exif'):
-            date_time = st.text_input("DateTime", value=exif_data.get("DateTime", ""))
-            make = st.text_input("Make (Camera Manufacturer)", value=exif_data.get("Make", ""))
-            model = st.text_input("Model (Camera Model)", value=exif_data.get("Model", ""))
-            exposure_time = st.text_input("Exposure Time", value=exif_data.get("ExposureTime", ""))
-            f_number = st.text_input("F Number", value=exif_data.get("FNumber", ""))
-            iso = st.text_input("ISO", value=exif_data.get("ISOSpeedRatings", ""))
-            gps_lat = st.text_input("GPS Latitude", value=str(exif_data.get("GPSLatitude", "")))
-            gps_lon = st.text_input("GPS Longitude", value=str(exif_data.get("GPSLongitude", "")))
-            gps_lat_ref = st.selectbox("GPS Latitude Ref", ["N", "S"], index=["N", "S"].index(exif_data.get("GPSLatitudeRef", "N")))
-            gps_lon_ref = st.selectbox("GPS Longitude Ref", ["E", "W"], index=["E", "W"].index(exif_data.get("GPSLongitudeRef", "E")))
+            updated_exif = edit_exif_fields(exif_data)
             
             # Submit button
             submit_button = st.form_submit_button("Update EXIF Data")
             
-            if submit_button:
-                updated_exif = {
-                    "DateTime": date_time,
-                    "Make": make,
-                    "Model": model,
-                    "ExposureTime": exposure_time,
-                    "FNumber": f_number,
-                    "ISOSpeedRatings": iso,
-                    "GPSLatitude": gps_lat,
-                    "GPSLongitude": gps_lon,
-                    "GPSLatitudeRef": gps_lat_ref,
-                    "GPSLongitudeRef": gps_lon_ref
-                }
-                
-                # Mise à jour des métadonnées EXIF
-                updated_image = update_exif_data(uploaded_file, updated_exif)
+            if not submit_button:
+                # Les résultats d'une soumission précédente ne seraient plus affichés
+                tasks.cancel("write_exif", "location_map")
+            else:
+                updated_exif = apply_gps_signs(updated_exif)
+                # Une nouvelle soumission annule le travail lancé pour la précédente
+                submission_key = (upload_key, tuple(updated_exif.items()))
+                # Vérification puis mise à jour des métadonnées EXIF
+                with perf.stage("validate"):
+                    errors = validate_exif_data(updated_exif)
+                for tag_name, message in errors.items():
+                    st.error(f"{tag_name}: {message}")
+                if errors:
+                    tasks.cancel("write_exif")
+                else:
+                    tasks.submit("write_exif", submission_key, write_exif_task,
+                                 upload, updated_exif, preview_cache, cancellable=True, perf=perf)
                 
-                # Afficher l'image mise à jour
-                buf = io.BytesIO()
-                updated_image.save(buf, format="JPEG")
-                buf.seek(0)
-                st.image(buf, caption='Updated Image', use_column_width=True)
-                st.success("EXIF Data updated successfully")
+                # La carte de la nouvelle position est produite pendant la réécriture
+                lat, lon = gps_coordinates([updated_exif])
+                has_position = not (np.isnan(lat[0]) or np.isnan(lon[0]))
+                if not has_position:
+                    tasks.cancel("location_map")
+                else:
+                    lat, lon = float(lat[0]), float(lon[0])
+                    tasks.submit("location_map", submission_key, location_map_task,
+                                 lat, lon, poi_index, map_cache, cancellable=True, perf=perf)
+
+                if not errors:
+                    try:
+                        updated_image, preview = tasks.wait("write_exif", st.empty(),
+                                                            "Updating EXIF data", perf)
+                    except ValueError as e:
+                        st.error(f"Error: {e}")
+                    else:
+                        # Afficher l'image mise à jour
+                        with perf.stage("send_image", len(preview)):
+                            st.image(preview, caption='Updated Image', use_column_width=True)
+                        st.success("EXIF Data updated successfully")
                 
                 # Afficher la nouvelle position GPS sur la carte
-                try:
-                    lat = float(gps_lat)
-                    lon = float(gps_lon)
-                    m = display_map(lat, lon)
-                    folium_static(m)
-                except ValueError:
+                if not has_position:
                     st.error("Invalid GPS coordinates")
+                else:
+                    html, positions, distances = tasks.wait("location_map", st.empty(),
+                                                            "Rendering the map", perf)
+                    with perf.stage("send_map", len(html)):
+                        show_map_html(html)
+
+                    # Points d'intérêt les plus proches de la position
+                    st.write("Nearest points of interest:")
+                    st.table([{"name": poi_index.pois[p]['name'], "distance (km)": round(d, 3)}
+                              for p, d in zip(positions[0], distances[0]) if p >= 0])
 
         # Afficher les POI
         st.subheader("Points of Interest")
-        pois = [
-            {'name': 'Tour Eiffel', 'lat': 48.8584, 'lon': 2.2945},
-            {'name': 'Grande Muraille de Chine', 'lat': 40.4319, 'lon': 116.5704},
-            {'name': 'Machu Picchu', 'lat': -13.1631, 'lon': -72.5450},
-            {'name': 'Sydney Opera House', 'lat': -33.8568, 'lon': 151.2153},
-            {'name': 'Statue de la Liberté', 'lat': 40.6892, 'lon': -74.0445}
-        ]
-        poi_map = folium.Map(location=[pois[0]['lat'], pois[0]['lon']], zoom_start=2)
-        add_pois(poi_map, pois)
-        folium_static(poi_map)
+        html = tasks.wait("poi_map", st.empty(), "Rendering the map", perf)
+        with perf.stage("send_map", len(html)):
+            show_map_html(html)
+    else:
+        # Plus aucun fichier : le travail en cours est abandonné
+        tasks.cancel("preview", "read_exif", "poi_map", "write_exif", "location_map")
+
+    # Modifier plusieurs images à la fois
+    bulk_edit_section(tasks, perf)
+
+    # Interroger les métadonnées déjà extraites
+    exif_query_section()
+
+    if perf.enabled:
+        performance_panel(perf, caches)
+        if PERF_PROMETHEUS_FILE:
+            write_prometheus_file(perf_metrics, PERF_PROMETHEUS_FILE)
+
+def streamlit_running():
+    """
+    Indique si le script est exécuté par 'streamlit run'.
+
+    Streamlit n'est importé que s'il l'est déjà : lancé par 'python', le
+    script n'en paie pas le coût.
+    """
+    if "streamlit" not in sys.modules:
+        return False
+    from streamlit import runtime
+    return runtime.exists()
 
 if __name__ == "__main__":
+    # 'streamlit run exo4.2.py' exécute le script sans argument : l'application web
+    if len(sys.argv) > 1 or not streamlit_running():
+        sys.exit(cli_main(sys.argv[1:]))
     main()
-
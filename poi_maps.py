@@ -0,0 +1,397 @@
+"""
+Points d'intérêt : index spatial, recherche des plus proches et cartes Folium.
+"""
+import csv
+import functools
+import os
+
+import numpy as np
+
+from exif_io import LRUCache
+
+# Cartes : dimensions d'affichage et budget mémoire du cache de leur HTML
+MAP_WIDTH = 700
+MAP_HEIGHT = 500
+MAP_CACHE_MAX_BYTES = int(os.environ.get("MAP_CACHE_MAX_BYTES", 16 * 1024 * 1024))
+
+# Au-delà de ce nombre de POI, le mode 'auto' regroupe les marqueurs
+POI_MARKER_LIMIT = 200
+
+# Création d'un marqueur de FastMarkerCluster à partir d'une ligne [lat, lon, nom]
+CLUSTER_MARKER_CALLBACK = """
+function (row) {
+    var marker = L.marker(new L.LatLng(row[0], row[1]));
+    var popup = document.createElement("span");
+    popup.textContent = row[2];
+    marker.bindPopup(popup);
+    return marker;
+}
+"""
+
+# Index spatial des POI : taille des cellules de la grille (en degrés),
+# rayon terrestre moyen et rayon de recherche autour de la position éditée
+POI_GRID_CELL_DEGREES = 2.0
+EARTH_RADIUS_KM = 6371.0088
+NEARBY_RADIUS_KM = 25.0
+NEAREST_POI_COUNT = 3
+
+# Nombre maximal de distances calculées à la fois par la recherche des plus proches POI
+NEAREST_BLOCK_ELEMENTS = 2_000_000
+
+# Points d'intérêt affichés sur la carte
+POIS = [
+    {'name': 'Tour Eiffel', 'lat': 48.8584, 'lon': 2.2945},
+    {'name': 'Grande Muraille de Chine', 'lat': 40.4319, 'lon': 116.5704},
+    {'name': 'Machu Picchu', 'lat': -13.1631, 'lon': -72.5450},
+    {'name': 'Sydney Opera House', 'lat': -33.8568, 'lon': 151.2153},
+    {'name': 'Statue de la Liberté', 'lat': 40.6892, 'lon': -74.0445}
+]
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """
+    Calcule la distance orthodromique (formule de haversine), de façon vectorisée.
+
+    Args:
+        lat1, lon1: Les coordonnées de départ, en degrés (scalaires ou tableaux).
+        lat2, lon2: Les coordonnées d'arrivée, en degrés (scalaires ou tableaux).
+
+    Returns:
+        numpy.ndarray: Les distances en kilomètres.
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=float)) for v in (lat1, lon1, lat2, lon2))
+    a = (np.sin((lat2 - lat1) / 2.0) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2.0) ** 2)
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+def expand_bbox(south, west, north, east, radius_km):
+    """
+    Agrandit un rectangle de coordonnées pour contenir tous les points à
+    moins de radius_km de l'un de ses points.
+
+    Args:
+        south, north (float): Les latitudes minimale et maximale.
+        west, east (float): Les longitudes ouest et est (west <= east).
+        radius_km (float): La distance à couvrir, en kilomètres.
+
+    Returns:
+        tuple: (sud, ouest, nord, est), ouest > est si le rectangle traverse l'antiméridien.
+    """
+    delta = radius_km / EARTH_RADIUS_KM
+    south = max(south - np.degrees(delta), -90.0)
+    north = min(north + np.degrees(delta), 90.0)
+    cos_lat = np.cos(np.radians(max(abs(south), abs(north))))
+    if south <= -90.0 or north >= 90.0 or np.sin(delta) >= cos_lat:
+        return south, -180.0, north, 180.0
+    # Écart de longitude maximal d'un point à distance delta (en radians)
+    delta_lon = np.degrees(np.arcsin(np.sin(delta) / cos_lat))
+    if east - west + 2.0 * delta_lon >= 360.0:
+        return south, -180.0, north, 180.0
+    west = (west - delta_lon + 180.0) % 360.0 - 180.0
+    east = (east + delta_lon + 180.0) % 360.0 - 180.0
+    return south, west, north, east
+
+def unit_vectors(lat, lon):
+    """
+    Convertit des coordonnées en vecteurs unitaires 3D (tableau (n, 3)).
+
+    Le produit scalaire de deux vecteurs unitaires décroît avec la distance
+    orthodromique : comparer des distances revient à un produit matriciel.
+    """
+    lat, lon = np.radians(lat), np.radians(lon)
+    cos_lat = np.cos(lat)
+    return np.stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)], axis=-1)
+
+class PoiIndex:
+    """
+    Catalogue de POI indexé par une grille régulière latitude/longitude.
+
+    Les POI sont triés par cellule : une requête ne parcourt que les cellules
+    qui recouvrent la zone demandée, puis filtre leurs POI de façon vectorisée.
+    """
+
+    def __init__(self, pois, cell_size=POI_GRID_CELL_DEGREES):
+        self.cell_size = cell_size
+        self.n_rows = int(np.ceil(180.0 / cell_size))
+        self.n_cols = int(np.ceil(360.0 / cell_size))
+        lat = np.array([poi['lat'] for poi in pois], dtype=float)
+        lon = np.array([poi['lon'] for poi in pois], dtype=float)
+        cells = self._rows(lat) * self.n_cols + self._cols(lon)
+        order = np.argsort(cells, kind="stable")
+        self.pois = [pois[i] for i in order]
+        self.lat = lat[order]
+        self.lon = lon[order]
+        self.cells = cells[order]
+        self.xyz = unit_vectors(self.lat, self.lon)
+
+    def __len__(self):
+        return len(self.pois)
+
+    def _rows(self, lat):
+        return np.clip(((np.asarray(lat) + 90.0) // self.cell_size).astype(np.int64), 0, self.n_rows - 1)
+
+    def _cols(self, lon):
+        return np.clip(((np.asarray(lon) + 180.0) // self.cell_size).astype(np.int64), 0, self.n_cols - 1)
+
+    def _candidates(self, south, west, north, east):
+        """
+        Renvoie les positions des POI des cellules qui recouvrent la zone.
+        """
+        if west > east:
+            # La zone traverse l'antiméridien : deux intervalles de longitude
+            return np.concatenate([self._candidates(south, west, north, 180.0),
+                                   self._candidates(south, -180.0, north, east)])
+        rows = np.arange(self._rows(south), self._rows(north) + 1)
+        first = rows * self.n_cols + self._cols(west)
+        last = rows * self.n_cols + self._cols(east)
+        starts = np.searchsorted(self.cells, first, side="left")
+        ends = np.searchsorted(self.cells, last, side="right")
+        ranges = [np.arange(start, end) for start, end in zip(starts, ends) if end > start]
+        return np.concatenate(ranges) if ranges else np.empty(0, dtype=np.int64)
+
+    def within_bbox(self, south, west, north, east):
+        """
+        Renvoie les POI situés dans un rectangle de coordonnées.
+
+        Args:
+            south, north (float): Les latitudes minimale et maximale.
+            west, east (float): Les longitudes ouest et est ; west > east
+                                pour une zone qui traverse l'antiméridien.
+
+        Returns:
+            list: Les POI de la zone.
+        """
+        candidates = self._candidates(south, west, north, east)
+        lat, lon = self.lat[candidates], self.lon[candidates]
+        inside = (lat >= south) & (lat <= north)
+        if west <= east:
+            inside &= (lon >= west) & (lon <= east)
+        else:
+            inside &= (lon >= west) | (lon <= east)
+        return [self.pois[i] for i in candidates[inside]]
+
+    def within_radius(self, lat, lon, radius_km):
+        """
+        Renvoie les POI situés à moins de radius_km d'un point, du plus proche au plus lointain.
+
+        Args:
+            lat, lon (float): Le point de référence, en degrés.
+            radius_km (float): Le rayon de recherche, en kilomètres.
+
+        Returns:
+            list: Des couples (POI, distance en km).
+        """
+        candidates = self._candidates(*expand_bbox(lat, lon, lat, lon, radius_km))
+        distances = haversine_km(lat, lon, self.lat[candidates], self.lon[candidates])
+        inside = distances <= radius_km
+        candidates, distances = candidates[inside], distances[inside]
+        order = np.argsort(distances, kind="stable")
+        return [(self.pois[candidates[i]], float(distances[i])) for i in order]
+
+    def _k_nearest_among(self, lat, lon, candidates, k):
+        """
+        Cherche les k POI les plus proches de chaque point parmi des candidats.
+
+        Les distances sont calculées par blocs de points pour borner la mémoire.
+
+        Returns:
+            tuple: (positions des POI, distances en km), deux tableaux (n, k)
+                   triés par distance croissante.
+        """
+        positions = np.empty((len(lat), k), dtype=np.int64)
+        distances = np.empty((len(lat), k))
+        block = max(1, NEAREST_BLOCK_ELEMENTS // max(len(candidates), 1))
+        points = unit_vectors(lat, lon)
+        cand_xyz = self.xyz[candidates]
+        for start in range(0, len(lat), block):
+            stop = start + block
+            # Plus le produit scalaire est grand, plus le POI est proche
+            similarity = points[start:stop] @ cand_xyz.T
+            if k < similarity.shape[1]:
+                best = np.argpartition(-similarity, k - 1, axis=1)[:, :k]
+            else:
+                best = np.argsort(-similarity, axis=1)
+            best_sim = np.take_along_axis(similarity, best, axis=1)
+            order = np.argsort(-best_sim, axis=1)
+            positions[start:stop] = candidates[np.take_along_axis(best, order, axis=1)]
+            chord = np.sqrt(np.clip(2.0 - 2.0 * np.take_along_axis(best_sim, order, axis=1), 0.0, 4.0))
+            distances[start:stop] = 2.0 * EARTH_RADIUS_KM * np.arcsin(np.minimum(chord / 2.0, 1.0))
+        return positions, distances
+
+    def nearest(self, lats, lons, k=1):
+        """
+        Cherche les k POI les plus proches de chaque point, de façon vectorisée.
+
+        Les points sont regroupés par cellule de la grille. Pour chaque cellule,
+        une première recherche dans les cellules voisines donne une distance
+        maximale, puis tous les POI à cette distance de la cellule sont comparés :
+        le résultat est exact, pour un nombre d'itérations Python égal au nombre
+        de cellules occupées et non au nombre de points.
+
+        Args:
+            lats, lons: Les coordonnées des points, en degrés (NaN si inconnues).
+            k (int): Le nombre de POI à renvoyer par point.
+
+        Returns:
+            tuple: (positions dans self.pois, distances en km), deux tableaux
+                   (n, k) ; -1 et inf pour les points sans coordonnées.
+        """
+        lats = np.asarray(lats, dtype=float).reshape(-1)
+        lons = np.asarray(lons, dtype=float).reshape(-1)
+        positions = np.full((len(lats), k), -1, dtype=np.int64)
+        distances = np.full((len(lats), k), np.inf)
+        k = min(k, len(self))
+        valid = np.flatnonzero(~(np.isnan(lats) | np.isnan(lons)))
+        if k == 0 or len(valid) == 0:
+            return positions, distances
+        cells = self._rows(lats[valid]) * self.n_cols + self._cols(lons[valid])
+        order = np.argsort(cells, kind="stable")
+        groups = np.split(order, np.flatnonzero(np.diff(cells[order])) + 1)
+        cell_km = np.radians(self.cell_size) * EARTH_RADIUS_KM
+        for group in groups:
+            points = valid[group]
+            row, col = divmod(int(cells[group[0]]), self.n_cols)
+            south, west = row * self.cell_size - 90.0, col * self.cell_size - 180.0
+            cell = (south, west, min(south + self.cell_size, 90.0), min(west + self.cell_size, 180.0))
+            # Voisinage de plus en plus large jusqu'à trouver k candidats
+            radius = cell_km
+            candidates = self._candidates(*expand_bbox(*cell, radius))
+            while len(candidates) < k:
+                radius *= 2.0
+                candidates = self._candidates(*expand_bbox(*cell, radius))
+            _, first = self._k_nearest_among(lats[points], lons[points], candidates, k)
+            candidates = self._candidates(*expand_bbox(*cell, first[:, -1].max()))
+            found, found_d = self._k_nearest_among(lats[points], lons[points], candidates, k)
+            positions[points, :k] = found
+            distances[points, :k] = found_d
+        return positions, distances
+
+def load_pois(path):
+    """
+    Charge un catalogue de POI depuis un fichier CSV avec les colonnes name, lat et lon.
+
+    Returns:
+        list: Les POI, sous forme de dictionnaires.
+    """
+    with open(path, newline="", encoding="utf-8") as fp:
+        return [{'name': row['name'], 'lat': float(row['lat']), 'lon': float(row['lon'])}
+                for row in csv.DictReader(fp)]
+
+@functools.lru_cache(maxsize=None)
+def poi_index_for(catalog=None):
+    """
+    Renvoie l'index d'un catalogue de POI, construit une fois par processus.
+
+    Args:
+        catalog (str): Le chemin d'un catalogue CSV, ou None pour les POI de l'application.
+    """
+    return PoiIndex(POIS if catalog is None else load_pois(catalog))
+
+def display_map(lat, lon, nearby_pois=()):
+    """
+    Crée une carte centrée sur les coordonnées fournies et ajoute un marqueur.
+
+    Args:
+        lat (float): Latitude pour centrer la carte.
+        lon (float): Longitude pour centrer la carte.
+        nearby_pois (list): Les POI proches à afficher autour de la position.
+
+    Returns:
+        folium.Map: Un objet carte Folium avec un marqueur à la position spécifiée.
+    """
+    import folium
+    m = folium.Map(location=[lat, lon], zoom_start=12)
+    folium.Marker([lat, lon], popup='Current Location').add_to(m)
+    if nearby_pois:
+        add_pois(m, nearby_pois)
+    return m
+
+def add_pois(map_obj, pois, mode="auto"):
+    """
+    Ajoute des points d'intérêt (POI) sur la carte.
+
+    Args:
+        map_obj (folium.Map): La carte Folium sur laquelle ajouter les POI.
+        pois (list): Une liste de dictionnaires contenant les informations des POI.
+                     Chaque dictionnaire doit avoir les clés 'name', 'lat' et 'lon'.
+        mode (str): 'markers' pour un marqueur Folium par POI, 'cluster' pour
+                    des marqueurs regroupés (FastMarkerCluster) créés en une
+                    fois à partir d'un seul tableau de données, 'canvas' pour
+                    des cercles dessinés sur un canvas à partir d'une seule
+                    couche GeoJSON, ou 'auto' pour 'markers' jusqu'à
+                    POI_MARKER_LIMIT POI et 'cluster' au-delà.
+    """
+    import folium
+    if mode == "auto":
+        mode = "markers" if len(pois) <= POI_MARKER_LIMIT else "cluster"
+    if mode == "markers":
+        for poi in pois:
+            folium.Marker([poi['lat'], poi['lon']], popup=poi['name']).add_to(map_obj)
+    elif mode == "cluster":
+        from folium.plugins import FastMarkerCluster
+        data = [[poi['lat'], poi['lon'], poi['name']] for poi in pois]
+        FastMarkerCluster(data, callback=CLUSTER_MARKER_CALLBACK).add_to(map_obj)
+    elif mode == "canvas":
+        # Les cercles sont dessinés sur un canvas plutôt qu'en éléments du DOM
+        map_obj.options["preferCanvas"] = True
+        features = [
+            {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [poi['lon'], poi['lat']]},
+                "properties": {"name": poi['name']},
+            }
+            for poi in pois
+        ]
+        folium.GeoJson(
+            {"type": "FeatureCollection", "features": features},
+            marker=folium.CircleMarker(radius=4, weight=1, fill=True, fill_opacity=0.8),
+            popup=folium.GeoJsonPopup(fields=["name"], labels=False),
+        ).add_to(map_obj)
+    else:
+        raise ValueError(f"Unknown POI display mode: {mode!r}")
+
+def get_map_cache():
+    """
+    Crée le cache du HTML des cartes partagé par l'application.
+    """
+    return LRUCache(MAP_CACHE_MAX_BYTES)
+
+def map_key(center, zoom, pois):
+    """
+    Construit la clé de cache d'une carte : centre, zoom et marqueurs.
+    """
+    markers = tuple((poi['lat'], poi['lon'], poi['name']) for poi in pois)
+    return (float(center[0]), float(center[1]), zoom, markers)
+
+def render_map_cached(key, build_map, cache):
+    """
+    Renvoie le HTML d'une carte, en ne la construisant qu'en l'absence du cache.
+
+    Args:
+        key: La clé de la carte (voir map_key).
+        build_map: Une fonction sans argument qui construit la carte Folium.
+        cache (LRUCache): Le cache à utiliser.
+
+    Returns:
+        str: Le HTML complet de la carte.
+    """
+    html = cache.get(key)
+    if html is None:
+        html = map_html(build_map())
+        cache.put(key, html)
+    return html
+
+def map_html(map_obj):
+    """
+    Produit le HTML complet d'une carte Folium.
+    """
+    import folium
+    return folium.Figure().add_child(map_obj).render()
+
+def build_poi_map(pois):
+    """
+    Construit la carte des points d'intérêt, centrée sur le premier.
+    """
+    import folium
+    poi_map = folium.Map(location=[pois[0]['lat'], pois[0]['lon']], zoom_start=2)
+    add_pois(poi_map, pois)
+    return poi_map
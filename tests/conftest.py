@@ -0,0 +1,37 @@
+import io
+import pathlib
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image
+
+# Les modules de l'application sont à la racine du dépôt
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+
+def make_jpeg(exif=None, size=(320, 240), seed=0):
+    """Produit un JPEG bruité, avec des métadonnées EXIF écrites par Pillow."""
+    pixels = np.random.default_rng(seed).integers(0, 256, (size[1], size[0], 3), dtype=np.uint8)
+    img = Image.fromarray(pixels)
+    buf = io.BytesIO()
+    if exif is None:
+        img.save(buf, format="JPEG", quality=90)
+    else:
+        pil_exif = Image.Exif()
+        for tag, value in exif.items():
+            pil_exif[tag] = value
+        img.save(buf, format="JPEG", quality=90, exif=pil_exif.tobytes())
+    return buf.getvalue()
+
+
+@pytest.fixture
+def plain_jpeg():
+    """Un JPEG sans métadonnées EXIF."""
+    return make_jpeg()
+
+
+@pytest.fixture
+def camera_jpeg():
+    """Un JPEG avec quelques tags de l'IFD0 (Make, Model, DateTime)."""
+    return make_jpeg({271: "Canon", 272: "EOS", 306: "2023:06:01 12:00:00"})
@@ -0,0 +1,109 @@
+import csv
+import json
+import zipfile
+
+import pytest
+
+from conftest import make_jpeg
+from exif_batch import BATCH_COLUMNS, run_batch
+from exif_io import update_exif_data
+
+
+@pytest.fixture
+def library(tmp_path):
+    photos = tmp_path / "photos"
+    (photos / "trip").mkdir(parents=True)
+    eiffel = update_exif_data(make_jpeg({271: "Canon", 306: "2023:06:01 12:00:00"}), {
+        "GPSLatitude": "48.8580", "GPSLatitudeRef": "N", "GPSLongitude": "2.2950", "GPSLongitudeRef": "E"})
+    (photos / "eiffel.jpg").write_bytes(eiffel)
+    (photos / "plain.JPEG").write_bytes(make_jpeg(seed=1))
+    (photos / "broken.jpg").write_bytes(b"not a jpeg")
+    (photos / "notes.txt").write_text("ignored")
+    sydney = update_exif_data(make_jpeg({271: "Nikon"}, seed=2), {
+        "GPSLatitude": "-33.8570", "GPSLongitude": "151.2150"})
+    (photos / "trip" / "sydney.jpg").write_bytes(sydney)
+    return photos
+
+
+def read_csv(path):
+    with open(path, newline="", encoding="utf-8") as fp:
+        return list(csv.DictReader(fp))
+
+
+def by_name(rows):
+    return {row["path"].replace("\\", "/").rsplit("/", 1)[-1]: row for row in rows}
+
+
+def test_csv_export(library, tmp_path):
+    output = tmp_path / "exif.csv"
+    progress = []
+    count = run_batch(str(library), str(output), progress=lambda n, name: progress.append(n))
+    assert count == 4
+    assert progress == [1, 2, 3, 4]
+    rows = read_csv(output)
+    assert list(rows[0]) == BATCH_COLUMNS
+    rows = by_name(rows)
+    assert sorted(rows) == ["broken.jpg", "eiffel.jpg", "plain.JPEG", "sydney.jpg"]
+    eiffel = rows["eiffel.jpg"]
+    assert eiffel["Make"] == "Canon" and eiffel["DateTime"] == "2023:06:01 12:00:00"
+    assert float(eiffel["GPSLatitude"]) == pytest.approx(48.858, abs=1e-4)
+    assert eiffel["NearestPOI"] == "Tour Eiffel"
+    assert float(eiffel["NearestPOIDistanceKm"]) < 1.0
+    # Les coordonnées sont écrites en valeur absolue, leur signe est dans la référence
+    sydney = rows["sydney.jpg"]
+    assert sydney["GPSLatitudeRef"] == "S"
+    assert sydney["NearestPOI"] == "Sydney Opera House"
+    assert rows["plain.JPEG"]["error"] == "" and rows["plain.JPEG"]["NearestPOI"] == ""
+    assert rows["broken.jpg"]["error"].startswith("ValueError")
+
+
+@pytest.mark.parametrize("workers, ordered", [(2, True), (2, False)])
+def test_workers_give_the_same_rows(library, tmp_path, workers, ordered):
+    run_batch(str(library), str(tmp_path / "serial.csv"))
+    run_batch(str(library), str(tmp_path / "parallel.csv"), workers=workers, chunk_size=1,
+              ordered=ordered)
+    serial = read_csv(tmp_path / "serial.csv")
+    parallel = read_csv(tmp_path / "parallel.csv")
+    if ordered:
+        assert parallel == serial
+    else:
+        assert by_name(parallel) == by_name(serial)
+
+
+def test_jsonl_export_from_zip(library, tmp_path):
+    archive_path = tmp_path / "photos.zip"
+    with zipfile.ZipFile(archive_path, "w") as archive:
+        archive.write(library / "eiffel.jpg", "a/eiffel.jpg")
+        archive.write(library / "broken.jpg", "broken.jpg")
+        archive.writestr("readme.txt", "ignored")
+    output = tmp_path / "exif.jsonl"
+    assert run_batch(str(archive_path), str(output)) == 2
+    rows = [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()]
+    assert [row["path"] for row in rows] == [f"{archive_path}:a/eiffel.jpg", f"{archive_path}:broken.jpg"]
+    assert rows[0]["Make"] == "Canon" and rows[0]["NearestPOI"] == "Tour Eiffel"
+    assert rows[1]["error"]
+
+
+def test_parquet_export(library, tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    output = tmp_path / "exif.parquet"
+    assert run_batch(str(library / "*.jpg"), str(output)) == 2
+    table = pq.read_table(output)
+    assert table.column_names == BATCH_COLUMNS
+    assert sorted(table.column("Make").to_pylist()) == ["", "Canon"]
+
+
+def test_custom_poi_catalog(library, tmp_path):
+    catalog = tmp_path / "pois.csv"
+    catalog.write_text("name,lat,lon\nTrocadéro,48.8616,2.2893\nLouvre,48.8606,2.3376\n",
+                       encoding="utf-8")
+    output = tmp_path / "exif.csv"
+    run_batch(str(library), str(output), poi_catalog=str(catalog))
+    rows = by_name(read_csv(output))
+    assert rows["eiffel.jpg"]["NearestPOI"] == "Trocadéro"
+    assert rows["sydney.jpg"]["NearestPOI"] == "Louvre"
+
+
+def test_unsupported_format(library, tmp_path):
+    with pytest.raises(ValueError):
+        run_batch(str(library), str(tmp_path / "exif.xlsx"))
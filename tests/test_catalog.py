@@ -0,0 +1,122 @@
+import os
+import sqlite3
+
+import pytest
+
+from conftest import make_jpeg
+from exif_catalog import ExifCatalog
+
+
+def write_photo(path, make="Canon", date="2023:06:01 12:00:00", seed=0):
+    path.write_bytes(make_jpeg({271: make, 306: date}, seed=seed))
+    return path
+
+
+@pytest.fixture
+def library(tmp_path):
+    photos = tmp_path / "photos"
+    photos.mkdir()
+    write_photo(photos / "a.jpg", "Canon", "2023:06:01 12:00:00", seed=0)
+    write_photo(photos / "b.jpg", "Nikon", "2023:06:30 23:59:59", seed=1)
+    write_photo(photos / "c.jpg", "Canon", "2023:07:01 00:00:00", seed=2)
+    return photos
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    with ExifCatalog(str(tmp_path / "catalog.sqlite")) as catalog:
+        yield catalog
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_scan_then_rescan(catalog, library, workers):
+    assert catalog.scan(str(library), workers=workers) == {
+        "added": 3, "updated": 0, "unchanged": 0, "removed": 0}
+    assert catalog.scan(str(library), workers=workers) == {
+        "added": 0, "updated": 0, "unchanged": 3, "removed": 0}
+    rows = catalog.query()
+    assert [row["path"] for row in rows] == [str(library / name) for name in ("a.jpg", "b.jpg", "c.jpg")]
+    assert rows[0]["make"] == "Canon" and rows[0]["exif"]["Make"] == "Canon"
+
+
+def test_paths_are_deduplicated_by_realpath(catalog, library, tmp_path, monkeypatch):
+    catalog.scan(str(library))
+    link = tmp_path / "link"
+    link.symlink_to(library, target_is_directory=True)
+    # Le même dossier, par un lien symbolique puis par un chemin relatif
+    assert catalog.scan(str(link))["unchanged"] == 3
+    monkeypatch.chdir(tmp_path)
+    assert catalog.scan("photos")["unchanged"] == 3
+    assert len(catalog) == 3
+    assert all(os.path.isabs(row["path"]) for row in catalog.query())
+
+
+def test_touched_file_with_same_content_is_not_reread(catalog, library):
+    catalog.scan(str(library))
+    path = library / "a.jpg"
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 5_000_000_000))
+    assert catalog.scan(str(library)) == {"added": 0, "updated": 0, "unchanged": 3, "removed": 0}
+    row = catalog.query(make="Canon", until="2023-06-01")[0]
+    assert row["mtime_ns"] == path.stat().st_mtime_ns
+    # Les informations de fichier sont à jour : l'analyse suivante ne calcule plus l'empreinte
+    assert catalog.scan(str(library))["unchanged"] == 3
+
+
+def test_modified_file_is_updated(catalog, library):
+    catalog.scan(str(library))
+    write_photo(library / "a.jpg", "Fujifilm", "2023:06:01 12:00:00", seed=3)
+    assert catalog.scan(str(library))["updated"] == 1
+    assert [row["path"] for row in catalog.query(make="Fujifilm")] == [str(library / "a.jpg")]
+    assert catalog.query(make="Canon", until="2023-06-30") == []
+
+
+def test_prune_removes_missing_and_relative_paths(catalog, library):
+    catalog.scan(str(library))
+    (library / "b.jpg").unlink()
+    with catalog._conn:
+        catalog._conn.execute(
+            "INSERT INTO photos (path, size, mtime_ns, exif, error) VALUES ('old/a.jpg', 1, 1, '{}', '')")
+    assert catalog.scan(str(library))["removed"] == 2
+    assert [row["path"] for row in catalog.query()] == [str(library / "a.jpg"), str(library / "c.jpg")]
+    # Sans prune, une photo disparue reste dans le catalogue
+    (library / "c.jpg").unlink()
+    assert catalog.scan(str(library), prune=False)["removed"] == 0
+    assert len(catalog) == 2
+
+
+@pytest.mark.parametrize("since, until, expected", [
+    (None, "2023-06", ["a.jpg", "b.jpg"]),
+    (None, "2023-06-30", ["a.jpg", "b.jpg"]),
+    (None, "2023-06-01", ["a.jpg"]),
+    (None, "2023:06:01 11:00", []),
+    ("2023-06-30", None, ["b.jpg", "c.jpg"]),
+    ("2023-06", "2023-07-01", ["a.jpg", "b.jpg", "c.jpg"]),
+    ("2023-07", "2023", ["c.jpg"]),
+])
+def test_date_range_prefixes(catalog, library, since, until, expected):
+    catalog.scan(str(library))
+    rows = catalog.query(since=since, until=until)
+    assert [os.path.basename(row["path"]) for row in rows] == expected
+
+
+def test_unreadable_file_is_recorded_with_its_error(catalog, library):
+    (library / "broken.jpg").write_bytes(b"not a jpeg")
+    catalog.scan(str(library))
+    broken = [row for row in catalog.query() if row["path"].endswith("broken.jpg")]
+    assert broken[0]["error"].startswith("ValueError")
+    assert broken[0]["hash"] is None
+
+
+def test_read_only_catalog(tmp_path, library):
+    path = tmp_path / "catalog.sqlite"
+    with pytest.raises(sqlite3.OperationalError):
+        ExifCatalog(str(path), read_only=True)
+    assert not path.exists()
+    with ExifCatalog(str(path)) as catalog:
+        catalog.scan(str(library))
+    with ExifCatalog(str(path), read_only=True) as catalog:
+        assert len(catalog) == 3
+        write_photo(library / "d.jpg", seed=4)
+        with pytest.raises(sqlite3.OperationalError):
+            catalog.scan(str(library))
@@ -0,0 +1,172 @@
+import io
+import struct
+
+import pytest
+from PIL import Image
+
+from conftest import make_jpeg
+from exif_io import gps_coordinates, read_exif_data, update_exif_data
+
+EXIF_IFD = 0x8769
+GPS_IFD = 0x8825
+MAKER_NOTE = 0x927C
+
+
+def scan_data(data):
+    """Renvoie tout ce qui suit l'en-tête JPEG : du marqueur SOS à la fin du fichier."""
+    assert data[:2] == b"\xff\xd8"
+    pos = 2
+    while data[pos + 1] != 0xDA:
+        assert data[pos] == 0xFF
+        (length,) = struct.unpack(">H", data[pos + 2:pos + 4])
+        pos += 2 + length
+    return data[pos:]
+
+
+def pil_exif(data):
+    """Les métadonnées EXIF lues par Pillow : (IFD0, IFD Exif, IFD GPS)."""
+    exif = Image.open(io.BytesIO(data)).getexif()
+    return dict(exif), dict(exif.get_ifd(EXIF_IFD)), dict(exif.get_ifd(GPS_IFD))
+
+
+def test_scan_data_is_byte_identical(camera_jpeg):
+    updated = update_exif_data(camera_jpeg, {"Make": "Nikon", "ExposureTime": "1/250"})
+    assert scan_data(updated) == scan_data(camera_jpeg)
+    # Les pixels décodés sont donc identiques eux aussi
+    assert (Image.open(io.BytesIO(updated)).tobytes()
+            == Image.open(io.BytesIO(camera_jpeg)).tobytes())
+
+
+def test_existing_and_new_tags_round_trip(camera_jpeg):
+    updated = update_exif_data(camera_jpeg, {
+        "Make": "A much longer manufacturer name than the original one",
+        "ExposureTime": "1/250",
+        "FNumber": "2.8",
+        "ISOSpeedRatings": "400",
+    })
+    ifd0, exif_ifd, _ = pil_exif(updated)
+    assert ifd0[271] == "A much longer manufacturer name than the original one"
+    # Les tags non modifiés sont conservés
+    assert ifd0[272] == "EOS"
+    assert ifd0[306] == "2023:06:01 12:00:00"
+    assert float(exif_ifd[0x829A]) == pytest.approx(1 / 250)
+    assert float(exif_ifd[0x829D]) == pytest.approx(2.8)
+    assert exif_ifd[0x8827] == 400
+
+
+def test_new_gps_ifd_in_image_without_exif(plain_jpeg):
+    updated = update_exif_data(plain_jpeg, {"GPSLatitude": "-33.8568", "GPSLatitudeRef": "N",
+                                                "GPSLongitude": "151.2153", "GPSLongitudeRef": "E"})
+    assert scan_data(updated) == scan_data(plain_jpeg)
+    _, _, gps = pil_exif(updated)
+    # Une latitude négative est écrite au sud
+    assert gps[1] == "S"
+    assert gps[3] == "E"
+    degrees, minutes, seconds = (float(value) for value in gps[2])
+    assert degrees + minutes / 60 + seconds / 3600 == pytest.approx(33.8568, abs=1e-6)
+    degrees, minutes, seconds = (float(value) for value in gps[4])
+    assert degrees + minutes / 60 + seconds / 3600 == pytest.approx(151.2153, abs=1e-6)
+
+
+def test_gps_refs_without_coordinates_are_not_written(camera_jpeg):
+    updated = update_exif_data(camera_jpeg, {"Model": "R5", "GPSLatitude": "",
+                                                 "GPSLatitudeRef": "N", "GPSLongitude": "",
+                                                 "GPSLongitudeRef": "E"})
+    _, _, gps = pil_exif(updated)
+    assert gps == {}
+
+
+def test_oversized_value_is_relocated(camera_jpeg):
+    description = "x" * 5000
+    updated = update_exif_data(camera_jpeg, {"ImageDescription": description})
+    ifd0, _, _ = pil_exif(updated)
+    assert ifd0[270] == description
+    assert ifd0[271] == "Canon"
+    assert scan_data(updated) == scan_data(camera_jpeg)
+
+
+def test_value_over_segment_limit_is_rejected(camera_jpeg):
+    with pytest.raises(ValueError):
+        update_exif_data(camera_jpeg, {"ImageDescription": "x" * 70000})
+
+
+def test_maker_note_survives_later_updates(camera_jpeg):
+    maker_note = bytes(range(256)) * 80
+    with_note = update_exif_data(camera_jpeg, {"MakerNote": maker_note, "FNumber": "4"})
+    updated = update_exif_data(with_note, {"Make": "Another manufacturer", "FNumber": "5.6",
+                                               "GPSLatitude": "48.8584", "GPSLatitudeRef": "N",
+                                               "GPSLongitude": "2.2945", "GPSLongitudeRef": "E"})
+    ifd0, exif_ifd, gps = pil_exif(updated)
+    assert exif_ifd[MAKER_NOTE] == maker_note
+    assert float(exif_ifd[0x829D]) == pytest.approx(5.6)
+    assert ifd0[271] == "Another manufacturer"
+    assert gps[1] == "N" and gps[3] == "E"
+    assert scan_data(updated) == scan_data(camera_jpeg)
+
+
+def test_reader_matches_pil(camera_jpeg):
+    updated = update_exif_data(camera_jpeg, {"ExposureTime": "1/60", "GPSLatitude": "10.5",
+                                                 "GPSLongitude": "-20.25"})
+    exif_data = read_exif_data(updated)
+    ifd0, exif_ifd, _ = pil_exif(updated)
+    assert exif_data["Make"] == ifd0[271]
+    assert float(exif_data["ExposureTime"]) == pytest.approx(float(exif_ifd[0x829A]))
+    lat, lon = gps_coordinates([exif_data])
+    assert (lat[0], lon[0]) == pytest.approx((10.5, -20.25))
+
+
+@pytest.mark.parametrize("data", [b"not a jpeg", b"", b"\xff\xd8\xff\xe1\x00"])
+def test_invalid_jpeg_is_rejected(data):
+    with pytest.raises(ValueError):
+        read_exif_data(data)
+    with pytest.raises(ValueError):
+        update_exif_data(data, {"Make": "Canon"})
+
+
+def test_large_image_header_only():
+    data = make_jpeg({271: "Canon"}, size=(1600, 1200), seed=1)
+    updated = update_exif_data(data, {"Model": "EOS"})
+    assert len(updated) - len(data) < 1024
+    assert scan_data(updated) == scan_data(data)
+
+
+def with_exif_block(jpeg, block):
+    """Insère un segment APP1 EXIF brut juste après le marqueur SOI."""
+    payload = b"Exif\x00\x00" + block
+    return jpeg[:2] + b"\xff\xe1" + struct.pack(">H", len(payload) + 2) + payload + jpeg[2:]
+
+
+def ifd(entries, next_ifd=0):
+    """Une table d'entrées IFD little-endian : [(tag, type, nombre, champ de 4 octets)]."""
+    table = struct.pack("<H", len(entries))
+    for tag, tag_type, count, field in entries:
+        table += struct.pack("<HHL", tag, tag_type, count) + field
+    return table + struct.pack("<L", next_ifd)
+
+
+@pytest.mark.parametrize("block", [
+    # IFD0 situé au-delà du bloc
+    b"II*\x00" + struct.pack("<L", 5000),
+    # Nombre d'entrées de l'IFD0 supérieur à ce que contient le bloc
+    b"II*\x00" + struct.pack("<L", 8) + struct.pack("<H", 400)
+    + struct.pack("<HHL", 274, 3, 1) + b"\x01\x00\x00\x00",
+    # Pointeur vers l'IFD Exif hors du bloc
+    b"II*\x00" + struct.pack("<L", 8) + ifd([(EXIF_IFD, 4, 1, struct.pack("<L", 9000))]),
+    # Valeur existante (Make) dont le décalage sort du bloc
+    b"II*\x00" + struct.pack("<L", 8) + ifd([(271, 2, 20, struct.pack("<L", 7000))]),
+])
+def test_out_of_range_ifds_are_rewritten(plain_jpeg, block):
+    data = with_exif_block(plain_jpeg, block)
+    read_exif_data(data)
+    updated = update_exif_data(data, {"Make": "Canon", "ExposureTime": "1/125"})
+    ifd0, exif_ifd, _ = pil_exif(updated)
+    assert ifd0[271] == "Canon"
+    assert float(exif_ifd[0x829A]) == pytest.approx(1 / 125)
+    assert read_exif_data(updated)["Make"] == "Canon"
+    assert scan_data(updated) == scan_data(plain_jpeg)
+
+
+def test_truncated_tiff_header_is_rejected(plain_jpeg):
+    data = with_exif_block(plain_jpeg, b"II*\x00")
+    with pytest.raises(ValueError):
+        update_exif_data(data, {"Make": "Canon"})
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from exif_io import (
+    _dms_triple, apply_gps_signs, dms_to_decimal, gps_coordinates, read_exif_data, update_exif_data,
+)
+
+
+def test_negative_dms_keeps_minutes_and_seconds():
+    lat, lon = gps_coordinates([{"GPSLatitude": "(-33, 51, 24)", "GPSLongitude": "(151, 12, 55)"}])
+    assert lat[0] == pytest.approx(-(33 + 51 / 60 + 24 / 3600))
+    assert lon[0] == pytest.approx(151 + 12 / 60 + 55 / 3600)
+
+
+def test_negative_zero_degrees():
+    assert dms_to_decimal([_dms_triple("(-0, 30, 0)")])[0] == pytest.approx(-0.5)
+
+
+def test_rational_dms_with_refs():
+    dms = [[(33, 1), (51, 1), (2400, 100)], [(151, 1), (12, 1), (55, 1)]]
+    decimal = dms_to_decimal(dms, refs=["S", "E"])
+    assert decimal == pytest.approx([-(33 + 51 / 60 + 24 / 3600), 151 + 12 / 60 + 55 / 3600])
+
+
+@pytest.mark.parametrize("value, expected, ref", [
+    ("-33.8567", 33.8567, "S"),
+    ("(-33, 51, 24)", 33 + 51 / 60 + 24 / 3600, "S"),
+    ("10", 10.0, "N"),
+])
+def test_apply_gps_signs(value, expected, ref):
+    result = apply_gps_signs({"GPSLatitude": value})
+    assert float(result["GPSLatitude"]) == pytest.approx(expected)
+    assert result["GPSLatitudeRef"] == ref
+
+
+def test_explicit_ref_is_kept_for_positive_values():
+    result = apply_gps_signs({"GPSLatitude": "10", "GPSLatitudeRef": "S",
+                                  "GPSLongitude": "20", "GPSLongitudeRef": ""})
+    assert result["GPSLatitudeRef"] == "S"
+    assert result["GPSLongitudeRef"] == "E"
+
+
+def test_negative_dms_is_written_south(plain_jpeg):
+    updated = update_exif_data(plain_jpeg, {"GPSLatitude": "(-33, 51, 24)",
+                                                "GPSLongitude": "(-70, 30, 0)"})
+    exif_data = read_exif_data(updated)
+    assert exif_data["GPSLatitudeRef"] == "S"
+    assert exif_data["GPSLongitudeRef"] == "W"
+    lat, lon = gps_coordinates([exif_data])
+    assert (lat[0], lon[0]) == pytest.approx((-(33 + 51 / 60 + 24 / 3600), -70.5), abs=1e-6)
+
+
+def test_positive_coordinates_reset_existing_south_west_refs(plain_jpeg):
+    south_west = update_exif_data(plain_jpeg, {"GPSLatitude": "-10", "GPSLongitude": "-20"})
+    assert np.allclose(gps_coordinates([read_exif_data(south_west)]), [[-10], [-20]])
+    # Comme 'python exo4.2.py write w.jpg --set GPSLatitude=10 GPSLongitude=20'
+    updated = update_exif_data(south_west, {"GPSLatitude": "10", "GPSLongitude": "20"})
+    lat, lon = gps_coordinates([read_exif_data(updated)])
+    assert (lat[0], lon[0]) == pytest.approx((10.0, 20.0))
@@ -0,0 +1,29 @@
+import os
+import threading
+
+from exif_perf import PerfRecorder, get_perf_metrics, write_prometheus_file
+
+
+def test_concurrent_prometheus_writes(tmp_path):
+    perf = PerfRecorder(True, get_perf_metrics())
+    with perf.stage("preview", 1024):
+        pass
+    path = tmp_path / "exif.prom"
+    errors = []
+
+    def write():
+        try:
+            for _ in range(50):
+                write_prometheus_file(perf.metrics, str(path))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    # Aucun fichier temporaire ne reste dans le dossier
+    assert os.listdir(tmp_path) == ["exif.prom"]
+    assert path.read_text() == perf.metrics.prometheus_text()
@@ -0,0 +1,121 @@
+import numpy as np
+import pytest
+
+from poi_maps import PoiIndex, haversine_km
+
+
+def random_pois(seed=0):
+    """POI répartis sur tout le globe, plus des amas près des pôles et de l'antiméridien."""
+    rng = np.random.default_rng(seed)
+    lat = np.degrees(np.arcsin(rng.uniform(-1.0, 1.0, 2000)))
+    lon = rng.uniform(-180.0, 180.0, 2000)
+    lat = np.concatenate([lat, rng.uniform(88.0, 90.0, 100), rng.uniform(-90.0, -88.0, 100),
+                          rng.uniform(-60.0, 60.0, 200)])
+    lon = np.concatenate([lon, rng.uniform(-180.0, 180.0, 200),
+                          (rng.uniform(178.0, 182.0, 200) + 180.0) % 360.0 - 180.0])
+    return [{'name': f"poi{i}", 'lat': float(a), 'lon': float(b)} for i, (a, b) in enumerate(zip(lat, lon))]
+
+
+@pytest.fixture(scope="module")
+def pois():
+    return random_pois()
+
+
+@pytest.fixture(scope="module", params=[0.5, 2.0, 7.0])
+def index(request, pois):
+    return PoiIndex(pois, cell_size=request.param)
+
+
+def names(pois):
+    return sorted(poi['name'] for poi in pois)
+
+
+@pytest.mark.parametrize("bbox", [
+    (40.0, -10.0, 55.0, 20.0),
+    (-90.0, -180.0, 90.0, 180.0),
+    # Zones qui traversent l'antiméridien (ouest > est)
+    (-30.0, 170.0, 30.0, -170.0),
+    (-5.0, 179.5, 5.0, -179.5),
+    # Calottes polaires
+    (85.0, -180.0, 90.0, 180.0),
+    (-90.0, 0.0, -87.0, 90.0),
+    (10.0, 10.0, 10.5, 10.5),
+])
+def test_within_bbox_matches_brute_force(index, pois, bbox):
+    south, west, north, east = bbox
+    expected = [poi for poi in pois if south <= poi['lat'] <= north and (
+        west <= poi['lon'] <= east if west <= east else (poi['lon'] >= west or poi['lon'] <= east))]
+    assert names(index.within_bbox(*bbox)) == names(expected)
+
+
+@pytest.mark.parametrize("center, radius_km", [
+    ((48.8584, 2.2945), 800.0),
+    ((0.0, 179.9), 400.0),
+    ((10.0, -179.5), 1500.0),
+    ((89.5, 0.0), 300.0),
+    ((89.9, -120.0), 50.0),
+    ((-89.0, 45.0), 500.0),
+    ((-60.0, 180.0), 3000.0),
+    ((20.0, 30.0), 25000.0),
+])
+def test_within_radius_matches_brute_force(index, pois, center, radius_km):
+    lat, lon = center
+    distances = haversine_km(lat, lon, [poi['lat'] for poi in pois], [poi['lon'] for poi in pois])
+    expected = sorted((d, poi['name']) for poi, d in zip(pois, distances) if d <= radius_km)
+    found = index.within_radius(lat, lon, radius_km)
+    assert sorted(poi['name'] for poi, _ in found) == sorted(name for _, name in expected)
+    found_distances = [d for _, d in found]
+    # Du plus proche au plus lointain
+    assert found_distances == sorted(found_distances)
+    assert found_distances == pytest.approx([d for d, _ in expected])
+
+
+def brute_force_nearest(pois, lats, lons, k):
+    """Les distances des k POI les plus proches de chaque point, par un parcours complet."""
+    poi_lat = np.array([poi['lat'] for poi in pois])
+    poi_lon = np.array([poi['lon'] for poi in pois])
+    distances = haversine_km(np.asarray(lats)[:, None], np.asarray(lons)[:, None], poi_lat, poi_lon)
+    return np.sort(distances, axis=1)[:, :k]
+
+
+@pytest.mark.parametrize("k", [1, 3, 10])
+def test_nearest_matches_brute_force(index, pois, k):
+    rng = np.random.default_rng(1)
+    lats = np.concatenate([np.degrees(np.arcsin(rng.uniform(-1.0, 1.0, 300))),
+                           [90.0, -90.0, 89.99, -89.99, 0.0, 0.0, 45.0, -45.0]])
+    lons = np.concatenate([rng.uniform(-180.0, 180.0, 300),
+                           [0.0, 0.0, 135.0, -45.0, 180.0, -180.0, 179.999, -179.999]])
+    positions, distances = index.nearest(lats, lons, k=k)
+    expected = brute_force_nearest(pois, lats, lons, k)
+    assert distances == pytest.approx(expected, abs=1e-6)
+    # Les positions désignent bien des POI à ces distances
+    found = np.array([[haversine_km(lat, lon, index.pois[p]['lat'], index.pois[p]['lon'])
+                       for p in row] for lat, lon, row in zip(lats, lons, positions)])
+    assert found == pytest.approx(distances, abs=1e-6)
+
+
+def test_nearest_across_the_antimeridian():
+    pois = [{'name': "east", 'lat': 0.0, 'lon': 179.9}, {'name': "far", 'lat': 0.0, 'lon': 170.0}]
+    index = PoiIndex(pois)
+    positions, distances = index.nearest([0.0], [-179.9])
+    assert index.pois[positions[0, 0]]['name'] == "east"
+    assert distances[0, 0] == pytest.approx(haversine_km(0.0, -179.9, 0.0, 179.9))
+
+
+def test_nearest_over_the_pole():
+    pois = [{'name': "across", 'lat': 89.0, 'lon': 180.0}, {'name': "same side", 'lat': 87.0, 'lon': 0.0}]
+    index = PoiIndex(pois)
+    # 1,5° par le pôle, contre 2,5° le long du méridien
+    positions, distances = index.nearest([89.5], [0.0], k=2)
+    assert [index.pois[p]['name'] for p in positions[0]] == ["across", "same side"]
+    assert distances[0] == pytest.approx([haversine_km(89.5, 0.0, 89.0, 180.0),
+                                          haversine_km(89.5, 0.0, 87.0, 0.0)])
+
+
+def test_nearest_without_coordinates_or_enough_pois(pois):
+    index = PoiIndex(pois[:2])
+    positions, distances = index.nearest([np.nan, 10.0], [0.0, 10.0], k=3)
+    assert positions[0].tolist() == [-1, -1, -1]
+    assert np.isinf(distances[0]).all()
+    assert sorted(positions[1, :2].tolist()) == [0, 1]
+    assert positions[1, 2] == -1 and np.isinf(distances[1, 2])
@@ -0,0 +1,27 @@
+import io
+
+import pytest
+from PIL import Image
+
+from conftest import make_jpeg
+from exif_io import make_preview
+
+
+def test_preview_of_plain_jpeg(plain_jpeg):
+    preview = Image.open(io.BytesIO(make_preview(plain_jpeg, max_size=64)))
+    assert preview.format == "JPEG"
+    assert max(preview.size) <= 64
+
+
+def test_png_named_as_jpeg_falls_back_to_pillow():
+    buf = io.BytesIO()
+    Image.new("RGB", (200, 100), "red").save(buf, format="PNG")
+    preview = Image.open(io.BytesIO(make_preview(buf.getvalue(), max_size=50)))
+    assert preview.format == "JPEG"
+    assert preview.size == (50, 25)
+
+
+def test_truncated_jpeg_raises_oserror():
+    data = make_jpeg()
+    with pytest.raises(OSError):
+        make_preview(data[:200])
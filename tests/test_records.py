@@ -0,0 +1,49 @@
+import zipfile
+
+import numpy as np
+import pytest
+
+from conftest import make_jpeg
+from exif_batch import extract_records
+from exif_catalog import ExifTable
+
+
+@pytest.fixture
+def photo_dir(tmp_path):
+    (tmp_path / "a.jpg").write_bytes(make_jpeg({271: "Canon", 272: "EOS R5"}))
+    (tmp_path / "b.jpg").write_bytes(make_jpeg({271: "Nikon", 272: "Z6"}, seed=1))
+    (tmp_path / "broken.jpg").write_bytes(b"not a jpeg")
+    return tmp_path
+
+
+def test_unreadable_image_keeps_its_error(photo_dir):
+    records = {record.source: record for record in extract_records(str(photo_dir / "*.jpg"))}
+    broken = records[str(photo_dir / "broken.jpg")]
+    assert broken.error.startswith("ValueError")
+    # Un tag absent de l'enregistrement ne relit pas l'image en échec
+    assert broken.get("MakerNote") is None
+    good = records[str(photo_dir / "a.jpg")]
+    assert good.error == ""
+    assert good.get("Make") == "Canon"
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_table_from_source(photo_dir, workers):
+    table = ExifTable.from_source(str(photo_dir / "*.jpg"), workers=workers)
+    rows = {row["path"]: row for row in table.to_rows()}
+    assert len(rows) == 3
+    assert rows[str(photo_dir / "a.jpg")]["Model"] == "EOS R5"
+    assert rows[str(photo_dir / "a.jpg")]["error"] == ""
+    assert rows[str(photo_dir / "broken.jpg")]["error"].startswith("ValueError")
+    assert rows[str(photo_dir / "broken.jpg")]["Make"] == ""
+    assert len(table.filter([("Make", "==", "Nikon")])) == 1
+
+
+def test_table_from_zip_names_members(photo_dir):
+    archive_path = photo_dir / "photos.zip"
+    with zipfile.ZipFile(archive_path, "w") as archive:
+        archive.write(photo_dir / "a.jpg", "trip/a.jpg")
+    table = ExifTable.from_source(str(archive_path))
+    assert table.columns["path"].tolist() == [f"{archive_path}:trip/a.jpg"]
+    assert table.columns["Make"].tolist() == ["Canon"]
+    assert np.isnan(table.columns["lat"]).all()
@@ -0,0 +1,120 @@
+import datetime
+import statistics
+from fractions import Fraction
+
+import numpy as np
+import pytest
+
+from exif_catalog import ExifTable
+
+
+def random_records(count=500, seed=0):
+    """Des dictionnaires EXIF variés, avec des valeurs absentes ou illisibles."""
+    rng = np.random.default_rng(seed)
+    models = ["EOS R5", "Z6", "X-T4", ""]
+    records = []
+    for i in range(count):
+        record = {"path": f"img{i}.jpg", "Make": "Canon", "Model": models[rng.integers(len(models))]}
+        if rng.random() < 0.8:
+            record["ISOSpeedRatings"] = int(rng.choice([100, 200, 400, 800, 3200, 6400]))
+        if rng.random() < 0.8:
+            record["ExposureTime"] = f"1/{int(rng.choice([30, 60, 125, 250, 1000]))}"
+        if rng.random() < 0.1:
+            record["FNumber"] = "illisible"
+        elif rng.random() < 0.9:
+            record["FNumber"] = float(rng.choice([1.8, 2.8, 4.0, 8.0]))
+        if rng.random() < 0.9:
+            seconds = int(rng.integers(0, 2 * 365 * 86400))
+            date = datetime.datetime(2022, 1, 1) + datetime.timedelta(seconds=seconds)
+            record["DateTime"] = date.strftime("%Y:%m:%d %H:%M:%S")
+        records.append(record)
+    return records
+
+
+def number(record, tag):
+    """La valeur numérique d'un tag, None si elle est absente ou illisible."""
+    try:
+        return float(Fraction(record[tag]))
+    except (KeyError, ValueError):
+        return None
+
+
+@pytest.fixture(scope="module")
+def records():
+    return random_records()
+
+
+@pytest.fixture(scope="module")
+def table(records):
+    return ExifTable.from_records(records)
+
+
+def paths(table):
+    return sorted(table.columns["path"].tolist())
+
+
+@pytest.mark.parametrize("conditions, keep", [
+    ([("Model", "==", "Z6")], lambda r: r["Model"] == "Z6"),
+    ([("Model", "!=", "Z6")], lambda r: r["Model"] not in ("Z6", "")),
+    ([("Model", "in", ["Z6", "X-T4"])], lambda r: r["Model"] in ("Z6", "X-T4")),
+    ([("ISOSpeedRatings", ">", 800)], lambda r: (number(r, "ISOSpeedRatings") or 0) > 800),
+    ([("ISOSpeedRatings", "<=", "400")],
+     lambda r: number(r, "ISOSpeedRatings") is not None and number(r, "ISOSpeedRatings") <= 400),
+    ([("ExposureTime", "<", "1/100")],
+     lambda r: number(r, "ExposureTime") is not None and number(r, "ExposureTime") < 0.01),
+    ([("FNumber", "between", (2.0, 4.0))],
+     lambda r: number(r, "FNumber") is not None and 2.0 <= number(r, "FNumber") <= 4.0),
+    ([("DateTime", "between", ("2023-03-01", "2023-03-31 23:59:59"))],
+     lambda r: "2023:03:01" <= r.get("DateTime", "") <= "2023:03:31 23:59:59"),
+    ([("DateTime", ">=", "2023:06:15 12:00:00"), ("Model", "==", "EOS R5"), ("ISOSpeedRatings", ">=", 400)],
+     lambda r: r.get("DateTime", "") >= "2023:06:15 12:00:00" and r["Model"] == "EOS R5"
+     and (number(r, "ISOSpeedRatings") or 0) >= 400),
+])
+def test_filter_matches_python(table, records, conditions, keep):
+    assert paths(table.filter(conditions)) == sorted(r["path"] for r in records if keep(r))
+
+
+def test_filter_without_conditions_keeps_everything(table):
+    assert len(table.filter([])) == len(table)
+
+
+def test_filter_rejects_unknown_column_or_operator(table):
+    with pytest.raises(KeyError):
+        table.filter([("Lens", "==", "x")])
+    with pytest.raises(ValueError):
+        table.filter([("Model", "~", "x")])
+
+
+@pytest.mark.parametrize("func, reference", [
+    ("sum", sum), ("mean", statistics.mean), ("min", min), ("max", max), ("median", statistics.median),
+])
+def test_group_by_matches_python(table, records, func, reference):
+    groups = {}
+    for record in records:
+        value = number(record, "ISOSpeedRatings")
+        if record["Model"] and value is not None:
+            groups.setdefault(record["Model"], []).append(value)
+    expected = [(model, reference(values)) for model, values in sorted(groups.items())]
+    result = table.group_by("Model", "ISOSpeedRatings", func)
+    assert [group for group, _ in result] == [group for group, _ in expected]
+    assert [value for _, value in result] == pytest.approx([value for _, value in expected])
+
+
+def test_group_by_count_ignores_missing_groups(table, records):
+    counts = {}
+    for record in records:
+        if record["Model"]:
+            counts[record["Model"]] = counts.get(record["Model"], 0) + 1
+    assert table.group_by("Model") == sorted(counts.items())
+
+
+def test_group_by_after_filter(table, records):
+    result = dict(table.filter([("ISOSpeedRatings", ">=", 3200)]).group_by("Model"))
+    for model, count in result.items():
+        assert count == sum(1 for r in records if r["Model"] == model
+                            and (number(r, "ISOSpeedRatings") or 0) >= 3200)
+
+
+def test_group_by_rejects_unknown_aggregate(table):
+    with pytest.raises(ValueError):
+        table.group_by("Model", "ISOSpeedRatings", "mode")